@@ -0,0 +1,71 @@
+import threading
+
+import arcade
+
+SPRITES = {
+    "bullet": ("assets/pistol_bullet.png", 1.0, (10, 10), arcade.color.YELLOW),
+    "zombie": ("assets/zombie.png", 2.0, (30, 30), arcade.color.DARK_GREEN),
+    "base": ("assets/base.png", 0.6, (64, 64), arcade.color.RED),
+    "player": ("assets/MainCharacter.png", 1.5, (40, 60), arcade.color.BLUE),
+    "pistol": ("assets/pistol.png", 0.8, (20, 10), arcade.color.BLACK),
+}
+
+TEXTURES = {name: spec[0] for name, spec in SPRITES.items()}
+TEXTURES["menu_background"] = "assets/menu_background.jpg"
+TEXTURES["background_forest"] = "assets/background_forest.png"
+
+# Файл сохранения партии (см. snapshot.py): меню проверяет его без импорта тяжёлых модулей игры.
+SAVE_PATH = "savegame.zsav"
+
+_textures = {}
+_locks = {name: threading.Lock() for name in TEXTURES}
+_uploaded = set()
+_preloader = None
+
+
+def get_texture(name):
+    texture = _textures.get(name)
+    if texture is not None or name in _textures:
+        return texture
+    # Каждая картинка декодируется один раз за процесс, даже если её одновременно просят фоновая загрузка и игра.
+    with _locks[name]:
+        if name not in _textures:
+            try:
+                _textures[name] = arcade.load_texture(TEXTURES[name])
+            except Exception:
+                _textures[name] = None
+    return _textures[name]
+
+
+def preload(names=None):
+    global _preloader
+    if _preloader is None:
+        pending = list(TEXTURES if names is None else names)
+        _preloader = threading.Thread(target=lambda: [get_texture(name) for name in pending],
+                                      name="asset-preload", daemon=True)
+        _preloader.start()
+    return _preloader
+
+
+def load_progress():
+    return len(_textures) / len(TEXTURES)
+
+
+def upload_next(ctx):
+    # Загрузка в атлас работает с GL, поэтому идёт из главного потока по одной текстуре за вызов.
+    for name, texture in list(_textures.items()):
+        if name in _uploaded:
+            continue
+        _uploaded.add(name)
+        if texture is not None:
+            ctx.default_atlas.add(texture)
+            return True
+    return False
+
+
+def make_sprite(name):
+    path, scale, size, color = SPRITES[name]
+    texture = get_texture(name)
+    if texture is None:
+        return arcade.SpriteSolidColor(size[0], size[1], color=color)
+    return arcade.Sprite(texture, scale=scale)
@@ -0,0 +1,115 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bot import Bot
+from simulation import DEFAULT_PARAMS, TICK_RATE, Simulation
+
+DEFAULT_MAX_TICKS = TICK_RATE * 60 * 5
+
+
+def run_game(job):
+    params, seed, max_ticks, width, height = job
+    sim = Simulation(width, height, seed=seed, params=params)
+    bot = Bot(sim)
+    peak_zombies = peak_bullets = peak_particles = 0
+
+    start = time.perf_counter()
+    while sim.tick < max_ticks and not sim.game_over:
+        sim.step(bot.update(sim))
+        peak_zombies = max(peak_zombies, sim.zombies.count)
+        peak_bullets = max(peak_bullets, len(sim.bullets))
+        peak_particles = max(peak_particles, sim.particles.count)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "params": params,
+        "seed": seed,
+        "survival": sim.time,
+        "survived": not sim.game_over,
+        "kills": sim.kills,
+        "peak_zombies": peak_zombies,
+        "peak_bullets": peak_bullets,
+        "peak_particles": peak_particles,
+        "ticks_per_sec": sim.tick / elapsed if elapsed else 0.0,
+    }
+
+
+def parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_sweep(text):
+    name, _, values = text.partition("=")
+    if name not in DEFAULT_PARAMS or not values:
+        raise argparse.ArgumentTypeError(
+            f"ожидается имя=значение1,значение2 с одним из: {', '.join(DEFAULT_PARAMS)}")
+    return name, [parse_value(value) for value in values.split(",")]
+
+
+def aggregate(results, names):
+    groups = {}
+    for result in results:
+        key = tuple(result["params"][name] for name in names)
+        groups.setdefault(key, []).append(result)
+
+    rows = []
+    for key, runs in groups.items():
+        survival = [run["survival"] for run in runs]
+        row = dict(zip(names, key))
+        row.update({
+            "runs": len(runs),
+            "survived": sum(run["survived"] for run in runs),
+            "survival_mean": round(sum(survival) / len(runs), 3),
+            "survival_min": round(min(survival), 3),
+            "survival_max": round(max(survival), 3),
+            "kills_mean": round(sum(run["kills"] for run in runs) / len(runs), 2),
+            "peak_zombies": max(run["peak_zombies"] for run in runs),
+            "peak_bullets": max(run["peak_bullets"] for run in runs),
+            "peak_particles": max(run["peak_particles"] for run in runs),
+            "ticks_per_sec": round(sum(run["ticks_per_sec"] for run in runs) / len(runs)),
+        })
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный прогон безоконных игр Z ATTACK с ботом")
+    parser.add_argument("--sweep", action="append", type=parse_sweep, default=[],
+                        help="перебор параметра, например spawn_rate=0.5,1,1.5 (можно несколько раз)")
+    parser.add_argument("--seeds", type=int, default=4, help="сколько игр на каждый набор параметров")
+    parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS, help="лимит длины одной игры")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="число процессов")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--out", default="batch_results.csv")
+    args = parser.parse_args()
+
+    names = [name for name, _ in args.sweep]
+    combos = itertools.product(*[values for _, values in args.sweep])
+    jobs = [(dict(zip(names, combo)), seed, args.max_ticks, args.width, args.height)
+            for combo in combos for seed in range(args.seeds)]
+    if not jobs:
+        parser.error("нечего запускать: --seeds должно быть больше нуля")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(run_game, jobs, chunksize=max(1, len(jobs) // (args.workers * 4))))
+    elapsed = time.perf_counter() - start
+
+    rows = aggregate(results, names)
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Игр: {len(jobs)}, наборов параметров: {len(rows)}, {elapsed:.1f} с -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
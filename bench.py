@@ -0,0 +1,355 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import eventlog
+from replay import apply_event
+from simulation import PLAYER_SPEED, PlayerInput, Simulation
+
+# Замеры Z ATTACK. На машине с дисплеем — просто python bench.py. В CI без дисплея с OpenGL через EGL —
+# ARCADE_HEADLESS=1 python bench.py (arcade сам создаст окно без экрана). В CI совсем без OpenGL —
+# python bench.py --sim-only: сценарии гоняют одну симуляцию, окно и arcade не создаются вовсе.
+# Базовые замеры для CI снимаются тем же режимом, что и проверка (--save с теми же флагами).
+
+BENCH_VERSION = 2
+BASELINE_PATH = "bench_baseline.json"
+DEFAULT_TICKS = 600
+WARMUP_TICKS = 60
+DEFAULT_TOLERANCE = 0.15
+BENCH_SEED = 1
+# Как в game.py: сам game не импортируется, пока не нужно окно, потому что тянет за собой arcade.
+VIEW_SIZE = (1280, 720)
+WORLD_SIZE = (VIEW_SIZE[0] * 3, VIEW_SIZE[1] * 3)
+
+# Волны не мешают замеру: зомби ровно столько, сколько задал сценарий, а игрок не погибает.
+BENCH_PARAMS = {"spawn_rate": 1e9, "player_max_hp": 10 ** 9, "zombie_damage": 0}
+
+# zombies — сколько зомби на карте, fire — стрелять каждый тик (упор в задержку оружия),
+# storm — сколько зомби в экране убивать раз в STORM_INTERVAL тиков (взамен появляются новые),
+# kite — игрок бежит по диагонали по кругу такого радиуса вокруг базы, и поле пути к нему всё время устаревает.
+SCENARIOS = {
+    "horde_100": {"zombies": 100},
+    "horde_1k": {"zombies": 1000},
+    "horde_5k": {"zombies": 5000},
+    "sustained_fire": {"zombies": 1000, "fire": True},
+    "particle_storm": {"zombies": 1000, "storm": 60},
+    "kiting_1k": {"zombies": 1000, "kite": 150},
+}
+STORM_INTERVAL = 20
+
+# Отдельная проверка навигации на сетке мира 3×3: p99 тика обновления полей не должен выходить за бюджет
+# независимо от базовых замеров (полный пересчёт поля за один тик давал p99 около 16 мс). Прогон повторяется
+# NAV_REPEATS раз и берётся лучший: на загруженной машине отдельный прогон может задеть чужая нагрузка.
+NAV_BUDGET_MS = 6.0
+NAV_TICKS = 600
+NAV_REPEATS = 3
+NAV_ZOMBIES = 1000
+NAV_RADIUS = 150
+
+# Для каких метрик рост — это ухудшение, а для каких — падение.
+HIGHER_IS_BETTER = {"ticks_per_sec"}
+CHECKED_METRICS = ("ticks_per_sec", "latency_p50_ms", "latency_p99_ms", "peak_memory_mb")
+
+
+class ScenarioRunner:
+    # Без окна (window=None) сценарий гоняет одну симуляцию: без спрайтов, отрисовки и OpenGL.
+    def __init__(self, window, name, spec, ticks=DEFAULT_TICKS, draw=True):
+        self.window = window
+        self.name = name
+        self.spec = spec
+        self.ticks = ticks
+        self.draw = draw and window is not None
+        self.view = None
+        self.sim = None
+        self.input = PlayerInput()
+        self.rng = None
+
+    def setup(self):
+        if self.window is None:
+            self.sim = Simulation(*WORLD_SIZE, seed=BENCH_SEED, params=BENCH_PARAMS, view_size=VIEW_SIZE)
+            self.input = PlayerInput()
+        else:
+            import views
+            view = views.get(self.window, "game")
+            # Качество зафиксировано на высоком: иначе сценарий мерил бы нагрузку, которую сам же и подстроил.
+            view.governor.enabled = False
+            views.show(self.window, "game", seed=BENCH_SEED, params=BENCH_PARAMS)
+            self.view = view
+            self.sim = view.sim
+        self.rng = np.random.default_rng(BENCH_SEED)
+        self.spawn(self.spec["zombies"])
+
+    def spawn(self, count):
+        sim = self.sim
+        x = self.rng.uniform(0, sim.width, count)
+        y = self.rng.uniform(0, sim.height, count)
+        for zx, zy in zip(x.tolist(), y.tolist()):
+            sim.zombies.add(zx, zy, sim.zombie_max_hp)
+
+    def visible_rect(self):
+        if self.view is not None:
+            return self.view.view
+        player = self.sim.player
+        half_width, half_height = VIEW_SIZE[0] / 2, VIEW_SIZE[1] / 2
+        return player.x - half_width, player.y - half_height, player.x + half_width, player.y + half_height
+
+    def script(self, tick):
+        sim = self.sim
+        if self.spec.get("fire"):
+            # Прицел обходит круг вокруг игрока: пули и лучи летят и в толпу, и в пустоту.
+            angle = tick * 0.05
+            event = ("fire", sim.player.x + math.cos(angle) * 300, sim.player.y + math.sin(angle) * 300)
+            if self.view is not None:
+                self.view.handle_input(event)
+            else:
+                apply_event(self.input, event)
+        storm = self.spec.get("storm")
+        if storm and tick % STORM_INTERVAL == 0:
+            zombies = sim.zombies
+            n = zombies.count
+            left, bottom, right, top = self.visible_rect()
+            visible = np.flatnonzero((zombies.x[:n] >= left) & (zombies.x[:n] <= right) &
+                                     (zombies.y[:n] >= bottom) & (zombies.y[:n] <= top) & (zombies.hp[:n] > 0))
+            killed = visible[:storm]
+            for index in killed.tolist():
+                sim.damage_zombie(index, sim.zombie_max_hp)
+            self.spawn(len(killed))
+        kite = self.spec.get("kite")
+        if kite:
+            place_kiter(sim, tick, kite)
+
+    def frame(self, tick):
+        self.script(tick)
+        if self.view is None:
+            self.sim.step(self.input)
+            self.input.clear_actions()
+            return
+        self.view.on_update(self.sim.dt)
+        if self.draw:
+            self.view.on_draw()
+
+    def run(self):
+        # Служебные сообщения игры (урон, подбор) не смешиваются с отчётом.
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.setup()
+            for tick in range(WARMUP_TICKS):
+                self.frame(tick)
+
+            latencies = np.zeros(self.ticks)
+            peak_zombies = peak_particles = 0
+            first_tick = self.sim.tick
+            if self.draw:
+                # Работа GPU, накопленная за разогрев, не должна попасть в первый замеренный кадр.
+                self.window.ctx.finish()
+            start = time.perf_counter()
+            for tick in range(self.ticks):
+                frame_start = time.perf_counter()
+                self.frame(WARMUP_TICKS + tick)
+                if self.draw:
+                    self.window.ctx.finish()
+                latencies[tick] = time.perf_counter() - frame_start
+                peak_zombies = max(peak_zombies, self.sim.zombies.count)
+                peak_particles = max(peak_particles, self.sim.particles.count)
+            elapsed = time.perf_counter() - start
+            # Тики считаются по симуляции: планировщик может изредка дать кадр без шага или с двумя.
+            ticks = self.sim.tick - first_tick
+
+        latencies *= 1000
+        return {
+            "ticks": ticks,
+            "ticks_per_sec": round(ticks / elapsed, 1),
+            "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "latency_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "latency_p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "latency_max_ms": round(float(latencies.max()), 3),
+            "peak_zombies": peak_zombies,
+            "peak_particles": peak_particles,
+        }
+
+    def measure_memory(self):
+        # Отдельный прогон под tracemalloc: трассировка замедляет выделения и исказила бы время.
+        gc.collect()
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.setup()
+                for tick in range(WARMUP_TICKS + self.ticks):
+                    self.frame(tick)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return round(peak / 2 ** 20, 2)
+
+
+def place_kiter(sim, tick, radius):
+    angle = tick * PLAYER_SPEED * math.sqrt(2) * sim.dt / radius
+    sim.player.x = sim.base.x + math.cos(angle) * radius
+    sim.player.y = sim.base.y + math.sin(angle) * radius
+
+
+def check_navigation(ticks=NAV_TICKS, repeats=NAV_REPEATS):
+    runs = [_navigation_run(ticks) for _ in range(repeats)]
+    return min(runs, key=lambda run: run["latency_p99_ms"])
+
+
+def _navigation_run(ticks):
+    # Только навигация, без окна: все зомби гонятся за игроком, и те, кого заслоняет база, идут по полю.
+    sim = Simulation(*WORLD_SIZE, seed=BENCH_SEED, params=BENCH_PARAMS)
+    navigator = sim.navigator
+    rng = np.random.default_rng(BENCH_SEED)
+    x = rng.uniform(0, sim.width, NAV_ZOMBIES)
+    y = rng.uniform(0, sim.height, NAV_ZOMBIES)
+    to_player = np.ones(NAV_ZOMBIES, dtype=bool)
+    latencies = np.zeros(ticks)
+    for tick in range(ticks):
+        place_kiter(sim, tick, NAV_RADIUS)
+        start = time.perf_counter()
+        navigator.update(sim.player.x, sim.player.y)
+        navigator.directions(x, y, to_player)
+        latencies[tick] = time.perf_counter() - start
+    latencies *= 1000
+    return {
+        "latency_p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "latency_max_ms": round(float(latencies.max()), 3),
+        "solves": navigator.player_field.recomputes,
+    }
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in CHECKED_METRICS:
+            if metric not in metrics or metric not in base or not base[metric]:
+                continue
+            change = metrics[metric] / base[metric] - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                failures.append((name, metric, base[metric], metrics[metric], worse))
+    return failures
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != BENCH_VERSION:
+        raise ValueError(f"Неподдерживаемая версия базовых замеров: {data.get('version')}")
+    return data
+
+
+def save_baseline(path, results, tolerance, ticks, mode):
+    data = {
+        "version": BENCH_VERSION,
+        "tolerance": tolerance,
+        "ticks": ticks,
+        "mode": mode,
+        "scenarios": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def print_results(results):
+    print(f"{'сценарий':<16}{'тиков/с':>10}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}{'макс мс':>9}{'память МБ':>11}")
+    for name, m in results.items():
+        memory = f"{m['peak_memory_mb']:.2f}" if "peak_memory_mb" in m else "-"
+        print(f"{name:<16}{m['ticks_per_sec']:>10.1f}{m['latency_p50_ms']:>9.2f}{m['latency_p95_ms']:>9.2f}"
+              f"{m['latency_p99_ms']:>9.2f}{m['latency_max_ms']:>9.2f}{memory:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Замеры производительности Z ATTACK на фиксированных сценариях",
+        epilog="В CI без дисплея: ARCADE_HEADLESS=1 python bench.py, а если нет и OpenGL — python bench.py --sim-only. "
+               "Базовые замеры снимаются в том же режиме, что и проверка.")
+    parser.add_argument("scenarios", nargs="*", help=f"какие сценарии гонять (по умолчанию все: {', '.join(SCENARIOS)})")
+    parser.add_argument("--ticks", type=int, default=DEFAULT_TICKS, help="тиков замера на сценарий")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON с базовыми замерами")
+    parser.add_argument("--save", action="store_true", help="записать результаты как новые базовые замеры")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="допустимое ухудшение, доля (по умолчанию из базовых замеров или 0.15)")
+    parser.add_argument("--no-draw", action="store_true", help="только обновление, без отрисовки")
+    parser.add_argument("--sim-only", action="store_true", help="только симуляция: без окна, спрайтов и OpenGL")
+    parser.add_argument("--no-memory", action="store_true", help="без прогона под tracemalloc")
+    parser.add_argument("--out", default=None, help="куда дополнительно записать результаты в JSON")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    names = args.scenarios or list(SCENARIOS)
+    mode = "sim" if args.sim_only else "update" if args.no_draw else "draw"
+
+    baseline = None
+    if not args.save and os.path.exists(args.baseline):
+        baseline = load_baseline(args.baseline)
+        # Замеры разных режимов и длин несравнимы: сравнение дало бы ложные регрессии.
+        if baseline["ticks"] != args.ticks or baseline["mode"] != mode:
+            parser.error(f"базовые замеры ({args.baseline}) сняты с --ticks {baseline['ticks']} в режиме "
+                         f"{baseline['mode']}, а сейчас --ticks {args.ticks} в режиме {mode}")
+
+    # Сообщения игры уходят только в журнал: консоль остаётся под отчёт.
+    eventlog.start(console=False)
+    navigation = check_navigation()
+    print(f"навигация: p99 {navigation['latency_p99_ms']:.2f} мс, худший тик {navigation['latency_max_ms']:.2f} мс "
+          f"(бюджет {NAV_BUDGET_MS:.1f}), полей пути {navigation['solves']}", flush=True)
+    failed = navigation["latency_p99_ms"] > NAV_BUDGET_MS
+    if failed:
+        print(f"РЕГРЕССИЯ навигация: p99 {navigation['latency_p99_ms']:.2f} мс дольше бюджета {NAV_BUDGET_MS:.1f} мс")
+    window = None
+    if mode != "sim":
+        import arcade
+        window = arcade.Window(*VIEW_SIZE, "Z ATTACK — замеры", visible=False)
+    results = {}
+    for name in names:
+        runner = ScenarioRunner(window, name, SCENARIOS[name], args.ticks, mode == "draw")
+        metrics = runner.run()
+        if not args.no_memory:
+            metrics["peak_memory_mb"] = runner.measure_memory()
+        results[name] = metrics
+        print(f"{name}: {metrics['ticks_per_sec']:.1f} тиков/с", flush=True)
+        gc.collect()
+    if window is not None:
+        window.close()
+
+    print_results(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save:
+        tolerance = DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance
+        previous = load_baseline(args.baseline) if os.path.exists(args.baseline) else None
+        # Сценарии, которые не гонялись в этот раз, остаются со старыми замерами, если те сняты так же;
+        # иначе файл переписывается целиком.
+        if previous is not None and previous["ticks"] == args.ticks and previous["mode"] == mode:
+            results = {**previous["scenarios"], **results}
+        save_baseline(args.baseline, results, tolerance, args.ticks, mode)
+        print(f"Базовые замеры записаны: {args.baseline}")
+    elif baseline is None:
+        print(f"Базовых замеров нет ({args.baseline}): запустите с --save, чтобы их записать")
+    else:
+        tolerance = baseline["tolerance"] if args.tolerance is None else args.tolerance
+        failures = compare(results, baseline["scenarios"], tolerance)
+        for name, metric, before, after, worse in failures:
+            print(f"РЕГРЕССИЯ {name}.{metric}: {before} -> {after} (хуже на {worse:.0%}, допуск {tolerance:.0%})")
+        if not failures:
+            print(f"Регрессий нет (допуск {tolerance:.0%})")
+        failed = failed or bool(failures)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
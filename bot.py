@@ -0,0 +1,42 @@
+import numpy as np
+
+from simulation import PlayerInput
+
+
+class Bot:
+    KITE_DISTANCE = 160
+    HOME_TOLERANCE = 10
+
+    def __init__(self, sim):
+        self.input = PlayerInput()
+        self.home_x = sim.player.x
+        self.home_y = sim.player.y
+
+    def update(self, sim):
+        inp = self.input
+        inp.reset_movement()
+        inp.fire = False
+        px, py = sim.player.x, sim.player.y
+
+        horde = sim.zombies
+        n = horde.count
+        if n:
+            dx = horde.x[:n] - px
+            dy = horde.y[:n] - py
+            d2 = dx * dx + dy * dy
+            nearest = int(np.argmin(d2))
+            inp.aim_x = float(horde.x[nearest])
+            inp.aim_y = float(horde.y[nearest])
+            inp.fire = True
+            if d2[nearest] < self.KITE_DISTANCE ** 2:
+                inp.left = dx[nearest] > 0
+                inp.right = dx[nearest] < 0
+                inp.down = dy[nearest] > 0
+                inp.up = dy[nearest] < 0
+                return inp
+
+        inp.left = px > self.home_x + self.HOME_TOLERANCE
+        inp.right = px < self.home_x - self.HOME_TOLERANCE
+        inp.down = py > self.home_y + self.HOME_TOLERANCE
+        inp.up = py < self.home_y - self.HOME_TOLERANCE
+        return inp
@@ -0,0 +1,167 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import traceback
+
+# Журнал событий и ошибок игры: JSON по строке на запись, с ротацией по размеру.
+LOG_PATH = os.environ.get("ZATTACK_LOG", "zattack.log")
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+# Сколько записей может ждать фонового потока; сверх этого новые отбрасываются и считаются.
+QUEUE_SIZE = 10000
+# Одна и та же ошибка пишется целиком не чаще раза в ERROR_WINDOW секунд, повторы между ними только считаются.
+ERROR_WINDOW = 5.0
+
+_logger = logging.getLogger("zattack")
+_logger.setLevel(logging.DEBUG)
+_logger.propagate = False
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "time": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+        }
+        event = getattr(record, "event", None)
+        if event is not None:
+            data["event"] = event
+        for name, value in (getattr(record, "fields", None) or {}).items():
+            data.setdefault(name, value)
+        if record.exc_text:
+            data["traceback"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _ErrorThrottle(logging.Filter):
+    # Повторы одной ошибки (тот же тип, текст и место) внутри окна не пишутся, а считаются;
+    # при следующей записи после окна к ней добавляется, сколько раз ошибка была пропущена.
+    def __init__(self, window=ERROR_WINDOW):
+        super().__init__()
+        self.window = window
+        self.seen = {}
+
+    def key(self, record):
+        if not record.exc_info:
+            return record.msg
+        _, exc, tb = record.exc_info
+        while tb is not None and tb.tb_next is not None:
+            tb = tb.tb_next
+        where = (tb.tb_frame.f_code.co_filename, tb.tb_lineno) if tb is not None else None
+        return record.msg, type(exc).__name__, str(exc), where
+
+    def filter(self, record):
+        if record.levelno < logging.ERROR:
+            return True
+        key = self.key(record)
+        now = record.created
+        state = self.seen.get(key)
+        if state is not None and now - state[0] < self.window:
+            state[1] += 1
+            return False
+        if state is not None and state[1]:
+            record.fields = {**(getattr(record, "fields", None) or {}), "repeated": state[1]}
+            record.msg = f"{record.msg} (повторилась {state[1]} раз за {self.window:.0f} с)"
+        self.seen[key] = [now, 0]
+        return True
+
+    def pending(self):
+        return [(key, count) for key, (_, count) in self.seen.items() if count]
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Traceback собирается здесь, пока кадры ещё живы; всё остальное форматирует фоновый поток.
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def start(path=LOG_PATH, console=True):
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return
+        log_queue = queue.Queue(QUEUE_SIZE)
+        handlers = []
+        try:
+            file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                                encoding="utf-8", delay=True)
+            file_handler.setFormatter(_JsonFormatter())
+            handlers.append(file_handler)
+        except OSError as e:
+            print(f"Журнал недоступен ({path}): {e}", file=sys.stderr)
+        if console:
+            # Телеметрия пишется уровнем DEBUG и в консоль не попадает.
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setLevel(logging.INFO)
+            handlers.append(console_handler)
+        _handler = _QueueHandler(log_queue)
+        _handler.addFilter(_ErrorThrottle())
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        _logger.addHandler(_handler)
+        atexit.register(stop)
+
+
+def stop():
+    global _listener, _handler
+    with _lock:
+        if _listener is None:
+            return
+        throttle = _handler.filters[0]
+        for key, count in throttle.pending():
+            _logger.warning(f"{key[0] if isinstance(key, tuple) else key}: ещё {count} повторов до выхода",
+                            extra={"fields": {"repeated": count}})
+        if _handler.dropped:
+            _logger.warning(f"Журнал не успевал: пропущено записей {_handler.dropped}")
+        _logger.removeHandler(_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _handler = None
+
+
+def info(message, **fields):
+    if _listener is None:
+        start()
+    _logger.info(message, extra={"fields": fields})
+
+
+def event(name, **fields):
+    # Телеметрия: только в файл, без строки в консоли.
+    if _listener is None:
+        start()
+    _logger.debug("", extra={"event": name, "fields": fields})
+
+
+def error(message, exc=None, **fields):
+    if _listener is None:
+        start()
+    if exc is None:
+        _logger.error(message, extra={"fields": fields})
+        return
+    _logger.error(f"{message}: {exc}", exc_info=(type(exc), exc, exc.__traceback__), extra={"fields": fields})
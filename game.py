@@ -1,59 +1,73 @@
 import arcade
 import arcade.gui
-import math
-import random
+import numpy as np
+import os
 import time
-import traceback
+
+import eventlog
+import views
+from assets import SAVE_PATH, make_sprite
+from pools import SpritePool
+from profiler import FrameProfiler
+from quality import QualityGovernor
+from render import DecalLayer, FrozenFrame, Hud, ParticleRenderer, ProfilerOverlay
+from replay import InputRecorder, apply_event
+from simulation import ITEM_KINDS, ITEM_SIZE, WEAPONS, PlayerInput, Simulation, TickScheduler
+from snapshot import SnapshotRing, load_snapshot, save_snapshot
+from world import ChunkMap
 
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 
-PLAYER_SPEED = 5
-ZOMBIE_SPEED = 2
-SPAWN_RATE = 1.5
-
-PLAYER_MAX_HP = 100
-ZOMBIE_DAMAGE = 20
-HIT_DELAY = 1.0
-
-BULLET_SPEED = 12
-ZOMBIE_MAX_HP = 2
-
-SHOOT_DELAY = 0.15
-
-
-class Particle(arcade.Sprite):
-    def __init__(self, texture_list, scale=1.0):
-        super().__init__(scale=scale)
-        self.textures = texture_list
-        self.texture = random.choice(texture_list)
-        self.change_x = 0
-        self.change_y = 0
-        self.change_angle = 0
-        self.lifetime = 0.5
-        self.fade_rate = 10
-
-    def update(self, delta_time: float = 1 / 60):
-        self.center_x += self.change_x
-        self.center_y += self.change_y
-        self.angle += self.change_angle
-        self.alpha -= self.fade_rate
-        if self.alpha <= 0:
-            self.remove_from_sprite_lists()
-
-
-class Zombie(arcade.Sprite):
-    def __init__(self, filename, scale=1.0):
-        super().__init__(filename, scale=scale)
-        self.hp = ZOMBIE_MAX_HP
+ZOMBIE_PREALLOC = 64
+BULLET_PREALLOC = 32
+ITEM_PREALLOC = 32
+
+# Путь для выгрузки замеров профилировщика в CSV при завершении сессии.
+PROFILE_CSV = os.environ.get("ZATTACK_PROFILE_CSV")
+# Путь для записи ввода игрока (seed + события по тикам) для последующего повтора.
+RECORD_PATH = os.environ.get("ZATTACK_RECORD")
+
+# Мир больше экрана: камера следует за игроком, фон подгружается чанками.
+WORLD_WIDTH = SCREEN_WIDTH * 3
+WORLD_HEIGHT = SCREEN_HEIGHT * 3
+# Запас вокруг экрана, в котором спрайты ещё синхронизируются, чтобы не было мерцания на краю.
+CULL_MARGIN = 64
+
+HUD_HINT = "ESC - Пауза | ЛКМ - Огонь | 1-3 - Оружие | H - Аптечка | F3 - Профайлер"
+
+WEAPON_KEYS = {
+    arcade.key.KEY_1: "pistol",
+    arcade.key.KEY_2: "shotgun",
+    arcade.key.KEY_3: "rifle",
+}
+WEAPON_NAMES = {
+    "pistol": "Пистолет",
+    "shotgun": "Дробовик",
+    "rifle": "Винтовка",
+}
+# Картинок для предметов нет: они рисуются цветными квадратами.
+ITEM_COLORS = {
+    "ammo": arcade.color.GOLD,
+    "medkit": arcade.color.WHITE,
+    "shotgun": arcade.color.ORANGE,
+    "rifle": arcade.color.SKY_BLUE,
+}
+# Сколько секунд виден след мгновенного выстрела.
+TRACER_TIME = 0.08
+# События симуляции, которые пишутся в журнал (выстрелы и убийства слишком часты и видны по счётчикам).
+LOGGED_EVENTS = {"player_hit", "player_down", "game_over", "pickup", "medkit"}
+# Яркость застывшего кадра игры под меню паузы и экраном поражения.
+PAUSE_BRIGHTNESS = 0.4
+GAME_OVER_BRIGHTNESS = 0.25
 
 
 class PauseView(arcade.View):
-    def __init__(self, game_view):
+    def __init__(self):
         super().__init__()
-        self.game_view = game_view
+        self.game_view = None
+        self.backdrop = None
         self.manager = arcade.gui.UIManager()
-        self.manager.enable()
 
         button_style = {
             "normal": {"font_name": ("Arial"), "font_size": 20, "font_color": arcade.color.WHITE, "bg": (50, 50, 50),
@@ -70,6 +84,10 @@ class PauseView(arcade.View):
         resume_btn.on_click = self._on_resume
         v_box.add(resume_btn)
 
+        save_btn = arcade.gui.UIFlatButton(text="СОХРАНИТЬ", width=250, height=50, style=button_style)
+        save_btn.on_click = self._on_save
+        v_box.add(save_btn)
+
         menu_btn = arcade.gui.UIFlatButton(text="В МЕНЮ", width=250, height=50, style=button_style)
         menu_btn.on_click = self._on_menu
         v_box.add(menu_btn)
@@ -78,26 +96,43 @@ class PauseView(arcade.View):
         anchor.add(v_box, anchor_x="center_x", anchor_y="center_y")
         self.manager.add(anchor)
 
-    def _on_resume(self, event):
+    def setup(self, game_view):
+        self.game_view = game_view
+        # Игра на паузе не меняется: её кадр снимается один раз, а не перерисовывается каждый кадр.
+        self.backdrop = game_view.freeze_frame()
+
+    def on_show_view(self):
+        self.manager.enable()
+
+    def on_hide_view(self):
         self.manager.disable()
+
+    def _on_save(self, event):
+        self.game_view.save_game()
+
+    def _on_resume(self, event):
         self.game_view.reset_movement()
         self.window.show_view(self.game_view)
 
     def _on_menu(self, event):
-        self.manager.disable()
+        # Выход в меню не теряет партию: её можно продолжить кнопкой в меню.
+        self.game_view.save_game()
+        self.game_view.end_session()
         try:
-            from main import MenuView
-            self.window.show_view(MenuView())
+            views.show(self.window, "menu")
         except Exception as e:
-            print(f"Ошибка перехода в меню: {e}")
+            eventlog.error("Ошибка перехода в меню", e)
 
     def on_draw(self):
         try:
-            self.game_view.on_draw()
-            arcade.draw_lbwh_rectangle_filled(0, 0, self.window.width, self.window.height, (0, 0, 0, 150))
+            self.clear()
+            self.backdrop.draw(PAUSE_BRIGHTNESS)
             self.manager.draw()
         except Exception as e:
-            print(f"Ошибка отрисовки паузы: {e}")
+            eventlog.error("Ошибка отрисовки паузы", e)
+
+    def on_resize(self, width, height):
+        self.backdrop = self.game_view.freeze_frame()
 
     def on_key_press(self, key, _modifiers):
         if key == arcade.key.ESCAPE: self._on_resume(None)
@@ -106,6 +141,8 @@ class PauseView(arcade.View):
 class GameOverView(arcade.View):
     def __init__(self):
         super().__init__()
+        self.backdrop = None
+        self.restart = None
         self.manager = arcade.gui.UIManager()
         self.time_elapsed = 0.0
         self.ui_enabled = False
@@ -133,6 +170,15 @@ class GameOverView(arcade.View):
         anchor.add(v_box, anchor_x="center_x", anchor_y="center_y")
         self.manager.add(anchor)
 
+    def setup(self, backdrop=None, restart=None):
+        self.backdrop = backdrop
+        self.restart = restart
+        self.time_elapsed = 0.0
+        self.ui_enabled = False
+
+    def on_hide_view(self):
+        self.manager.disable()
+
     def on_update(self, delta_time):
         self.time_elapsed += delta_time
         if not self.ui_enabled and self.time_elapsed > 1.0:
@@ -140,22 +186,22 @@ class GameOverView(arcade.View):
             self.ui_enabled = True
 
     def _on_restart(self, event):
-        self.manager.disable()
-        game = GameView()
-        game.setup()
-        self.window.show_view(game)
+        if self.restart is not None:
+            self.restart(self.window)
+            return
+        views.show(self.window, "game")
 
     def _on_menu(self, event):
-        self.manager.disable()
         try:
-            from main import MenuView
-            self.window.show_view(MenuView())
+            views.show(self.window, "menu")
         except Exception as e:
-            print(f"Ошибка: {e}")
+            eventlog.error("Ошибка перехода в меню", e)
 
     def on_draw(self):
         self.clear()
         arcade.set_background_color(arcade.color.BLACK)
+        if self.backdrop is not None:
+            self.backdrop.draw(GAME_OVER_BRIGHTNESS)
         self.manager.draw()
         if not self.ui_enabled:
             arcade.draw_text("...", self.window.width / 2, 100, arcade.color.WHITE, anchor_x="center")
@@ -165,353 +211,571 @@ class GameView(arcade.View):
     def __init__(self):
         super().__init__()
 
-        try:
-            self.bullet_texture = arcade.load_texture("assets/pistol_bullet.png")
-        except:
-            self.bullet_texture = arcade.make_soft_square_texture(10, arcade.color.YELLOW, outer_alpha=255)
+        self.sim = None
+        self.scheduler = None
+        self.input = PlayerInput()
 
         self.player_list = None
         self.wall_list = None
         self.enemy_list = None
         self.bullet_list = None
-        self.particle_list = None
+        self.item_list = None
+        self.particle_renderer = None
+        self.decals = None
+        self.frozen = None
         self.gun_list = None
 
         self.player_sprite = None
         self.pistol_sprite = None
+        self.ally_sprites = []
         self.base_sprite = None
 
-        self.physics_engine = None
-        self.time_since_last_spawn = 0.0
-        self.can_shoot_timer = 0.0
-
-        self.hp = PLAYER_MAX_HP
-        self.last_hit_time = 0
-
-        self.left = False
-        self.right = False
-        self.up = False
-        self.down = False
-
-        self.mouse_x = 0
-        self.mouse_y = 0
-
-        self.blood_textures = []
-        for i in range(4):
-            tex = arcade.make_circle_texture(diameter=random.randint(4, 10), color=arcade.color.RED_DEVIL)
-            self.blood_textures.append(tex)
-
-        self.smoke_textures = []
-        for i in range(3):
-            tex = arcade.make_circle_texture(diameter=random.randint(5, 12), color=arcade.color.GRAY)
-            self.smoke_textures.append(tex)
-
-    def setup(self):
+        self.zombie_pool = None
+        self.bullet_pool = None
+        self.item_pool = None
+
+        self.recorder = None
+        self.replay = None
+        self.rewind_ring = SnapshotRing()
+
+        self.tracers = []
+        self.camera = None
+        self.chunks = None
+        self.view = None
+        self.mouse = None
+
+        self.profiler = FrameProfiler(csv_path=PROFILE_CSV)
+        self.profiler_overlay = ProfilerOverlay(self.profiler, top=70)
+        self.hud = Hud(HUD_HINT)
+        self.launch_time = None
+        # Качество подстраивается под время кадра и переживает setup (загрузку, перемотку): машина та же.
+        self.governor = QualityGovernor()
+        self.frame_start = None
+        self.session_open = False
+        self.window.push_handlers(on_close=self.end_session)
+
+    @property
+    def hp(self):
+        return self.sim.hp
+
+    def setup(self, seed=None, replay=None, params=None, sim=None):
+        if sim is not None:
+            self.sim = sim
+        elif replay is not None:
+            self.sim = replay.make_simulation()
+        else:
+            self.sim = Simulation(WORLD_WIDTH, WORLD_HEIGHT, seed=seed, params=params, view_size=self.window.size)
+        self.sim.profiler = self.profiler
+        self.scheduler = TickScheduler(self.sim.dt)
+        self.input = PlayerInput()
+
+        self.rewind_ring.clear()
+        self.tracers = []
+
+        self.replay = replay
+        self.recorder = None
+        self.session_open = True
+        if replay is not None:
+            replay.rewind()
+        elif RECORD_PATH and sim is None:
+            # Продолжение сохранённой партии не записывается: запись воспроизводится только с начала.
+            self.recorder = InputRecorder(self.sim.seed, self.sim.width, self.sim.height, self.sim.params,
+                                          self.sim.view_size)
+
+        if self.player_list is None:
+            self.create_sprites()
+        else:
+            # Повторная партия в том же виде: спрайты возвращаются в пулы, а не создаются заново.
+            self.zombie_pool.release_all()
+            self.bullet_pool.release_all()
+            self.item_pool.release_all()
+        self.base_sprite.center_x = self.sim.base.x
+        self.base_sprite.center_y = self.sim.base.y
+        if self.particle_renderer is None or self.particle_renderer.capacity < self.sim.particles.capacity:
+            self.particle_renderer = ParticleRenderer(self.window.ctx, self.sim.particles.capacity)
+        # Слой следов переживает перезапуск партии: текстура та же, только очищается.
+        if self.decals is None or (self.decals.width, self.decals.height) != (self.sim.width, self.sim.height):
+            self.decals = DecalLayer(self.window.ctx, self.sim.width, self.sim.height)
+        else:
+            self.decals.clear()
+        self.sim.particles.track_expired()
+
+        if self.chunks is None or (self.chunks.width, self.chunks.height) != (self.sim.width, self.sim.height):
+            self.chunks = ChunkMap(self.sim.width, self.sim.height, seed=self.sim.seed)
+        else:
+            self.chunks.reset(self.sim.seed)
+        self.mouse = None
+        self.frame_start = None
+        self.apply_quality()
+        self.sync_sprites()
+
+    def create_sprites(self):
         self.player_list = arcade.SpriteList()
         self.wall_list = arcade.SpriteList()
         self.enemy_list = arcade.SpriteList()
         self.bullet_list = arcade.SpriteList()
-        self.particle_list = arcade.SpriteList()
         self.gun_list = arcade.SpriteList()
+        self.item_list = arcade.SpriteList()
 
-        self.hp = PLAYER_MAX_HP
-        self.last_hit_time = 0
-        self.can_shoot_timer = 0.0
-
-        cx = self.window.width // 2
-        cy = self.window.height // 2
+        self.zombie_pool = SpritePool(self.enemy_list, lambda: make_sprite("zombie"), prealloc=ZOMBIE_PREALLOC)
+        self.bullet_pool = SpritePool(self.bullet_list, lambda: make_sprite("bullet"), prealloc=BULLET_PREALLOC)
+        self.item_pool = SpritePool(self.item_list, lambda: arcade.SpriteSolidColor(*ITEM_SIZE),
+                                    prealloc=ITEM_PREALLOC)
 
-        try:
-            self.base_sprite = arcade.Sprite("assets/base.png", scale=0.6)
-        except:
-            self.base_sprite = arcade.SpriteSolidColor(64, 64, arcade.color.RED)
-        self.base_sprite.center_x = cx
-        self.base_sprite.center_y = cy
+        self.base_sprite = make_sprite("base")
         self.wall_list.append(self.base_sprite)
 
-        try:
-            self.player_sprite = arcade.Sprite("assets/MainCharacter.png", scale=1.5)
-        except:
-            self.player_sprite = arcade.SpriteSolidColor(40, 60, arcade.color.BLUE)
-        self.player_sprite.center_x = cx - 100
-        self.player_sprite.center_y = cy
+        self.player_sprite = make_sprite("player")
         self.player_list.append(self.player_sprite)
 
-        try:
-            self.pistol_sprite = arcade.Sprite("assets/pistol.png", scale=0.8)
-        except:
-            self.pistol_sprite = arcade.SpriteSolidColor(20, 10, arcade.color.BLACK)
-
+        self.pistol_sprite = make_sprite("pistol")
         self.gun_list.append(self.pistol_sprite)
+        self.ally_sprites = []
 
-        self.physics_engine = arcade.PhysicsEngineSimple(self.player_sprite, self.wall_list)
+        self.camera = arcade.Camera2D()
 
     def on_show_view(self):
         arcade.set_background_color(arcade.color.DARK_OLIVE_GREEN)
 
-    def spawn_enemy(self):
+    def follow_player(self, x, y):
+        sim = self.sim
+        half_width = self.window.width / 2
+        half_height = self.window.height / 2
+        x = min(max(x, half_width), sim.width - half_width) if sim.width > self.window.width else sim.width / 2
+        y = min(max(y, half_height), sim.height - half_height) if sim.height > self.window.height else sim.height / 2
+        self.camera.position = (x, y)
+        self.view = (x - half_width, y - half_height, x + half_width, y + half_height)
+        self.chunks.update(*self.view)
+
+    def to_world(self, x, y):
+        point = self.camera.unproject((x, y))
+        return point.x, point.y
+
+    def _sync_bullets(self, alpha):
+        pool = self.bullet_pool
+        left, bottom, right, top = self.view
+        seen = set()
+        for bullet in self.sim.bullets:
+            x = bullet.prev_x + (bullet.x - bullet.prev_x) * alpha
+            y = bullet.prev_y + (bullet.y - bullet.prev_y) * alpha
+            if x < left or x > right or y < bottom or y > top:
+                continue
+            sprite = pool.get(bullet)
+            sprite.center_x = x
+            sprite.center_y = y
+            sprite.angle = bullet.angle
+            seen.add(bullet)
+        pool.release_missing(seen)
+
+    def _sync_horde(self, alpha):
+        horde = self.sim.zombies
+        n = horde.count
+        pool = self.zombie_pool
+        seen = set()
+        xs = horde.prev_x[:n] + (horde.x[:n] - horde.prev_x[:n]) * alpha
+        ys = horde.prev_y[:n] + (horde.y[:n] - horde.prev_y[:n]) * alpha
+        # Спрайты есть только у зомби в пределах экрана, остальные возвращаются в пул.
+        left, bottom, right, top = self.view
+        visible = np.flatnonzero((xs >= left - CULL_MARGIN) & (xs <= right + CULL_MARGIN) &
+                                 (ys >= bottom - CULL_MARGIN) & (ys <= top + CULL_MARGIN))
+        for zombie_id, x, y, angle in zip(horde.ids[:n][visible].tolist(), xs[visible].tolist(),
+                                          ys[visible].tolist(), horde.angle[:n][visible].tolist()):
+            sprite = pool.get(zombie_id)
+            sprite.center_x = x
+            sprite.center_y = y
+            sprite.angle = angle
+            seen.add(zombie_id)
+        pool.release_missing(seen)
+
+    def _sync_items(self, alpha):
+        items = self.sim.items
+        pool = self.item_pool
+        seen = set()
+        # Из сетки предметов берутся только попавшие в экран, как и у зомби.
+        left, bottom, right, top = self.view
+        visible = items.query(left - CULL_MARGIN, bottom - CULL_MARGIN, right + CULL_MARGIN, top + CULL_MARGIN)
+        for item_id, kind, x, y, prev_x, prev_y in zip(items.ids[visible].tolist(), items.kind[visible].tolist(),
+                                                       items.x[visible].tolist(), items.y[visible].tolist(),
+                                                       items.prev_x[visible].tolist(), items.prev_y[visible].tolist()):
+            sprite = pool.get(item_id)
+            sprite.center_x = prev_x + (x - prev_x) * alpha
+            sprite.center_y = prev_y + (y - prev_y) * alpha
+            sprite.color = ITEM_COLORS[ITEM_KINDS[kind]]
+            seen.add(item_id)
+        pool.release_missing(seen)
+
+    def _sync_allies(self, alpha):
+        # Остальные игроки кооператива рисуются теми же спрайтами, что и свой.
+        allies = self.sim.players[1:]
+        while len(self.ally_sprites) < len(allies):
+            sprites = (make_sprite("player"), make_sprite("pistol"))
+            self.player_list.append(sprites[0])
+            self.gun_list.append(sprites[1])
+            self.ally_sprites.append(sprites)
+        for i, (player_sprite, gun_sprite) in enumerate(self.ally_sprites):
+            visible = i < len(allies) and allies[i].alive
+            player_sprite.visible = gun_sprite.visible = visible
+            if not visible:
+                continue
+            body = allies[i].body
+            player_sprite.center_x = gun_sprite.center_x = body.prev_x + (body.x - body.prev_x) * alpha
+            player_sprite.center_y = gun_sprite.center_y = body.prev_y + (body.y - body.prev_y) * alpha
+            gun_sprite.angle = allies[i].aim_angle
+
+    def sync_sprites(self, alpha=1.0):
+        player = self.sim.player
+        x = player.prev_x + (player.x - player.prev_x) * alpha
+        y = player.prev_y + (player.y - player.prev_y) * alpha
+        self.player_sprite.center_x = x
+        self.player_sprite.center_y = y
+        self.pistol_sprite.center_x = x
+        self.pistol_sprite.center_y = y
+        self.pistol_sprite.angle = self.sim.aim_angle
+        self.follow_player(x, y)
+
+        self._sync_allies(alpha)
+        self._sync_horde(alpha)
+        self._sync_items(alpha)
+        self._sync_bullets(alpha)
+
+    def handle_input(self, event):
+        if self.replay is not None:
+            return
+        if self.recorder is not None:
+            self.recorder.record(self.sim.tick, event)
+        apply_event(self.input, event)
+
+    def save_recording(self):
+        if self.recorder is not None and self.recorder.events:
+            self.recorder.save(RECORD_PATH, self.sim)
+
+    def save_game(self):
+        if self.replay is not None or self.sim.game_over:
+            return
         try:
-            zombie = Zombie("assets/zombie.png", scale=2.0)
-        except:
-            zombie = Zombie(":resources:images/animated_characters/zombie/zombie_idle.png", scale=1.0)
-            if not getattr(zombie, 'texture', None):
-                zombie = arcade.SpriteSolidColor(30, 30, arcade.color.DARK_GREEN)
-                zombie.hp = ZOMBIE_MAX_HP
-
-        side = random.randint(0, 3)
-        spawn_offset = 50
-        w, h = self.window.width, self.window.height
-
-        if side == 0:
-            zombie.center_x = random.randint(0, w)
-            zombie.center_y = h + spawn_offset
-        elif side == 1:
-            zombie.center_x = w + spawn_offset
-            zombie.center_y = random.randint(0, h)
-        elif side == 2:
-            zombie.center_x = random.randint(0, w)
-            zombie.center_y = -spawn_offset
-        elif side == 3:
-            zombie.center_x = -spawn_offset
-            zombie.center_y = random.randint(0, h)
-
-        self.enemy_list.append(zombie)
-
-    def create_blood_effect(self, x, y, is_explosion=False):
-        count = 15 if is_explosion else 5
-        speed_factor = 4.0 if is_explosion else 2.0
-        for _ in range(count):
-            particle = Particle(self.blood_textures)
-            particle.center_x = x
-            particle.center_y = y
-            angle = random.random() * 2 * math.pi
-            speed = random.random() * speed_factor
-            particle.change_x = math.cos(angle) * speed
-            particle.change_y = math.sin(angle) * speed
-            particle.change_angle = random.randint(-5, 5)
-            self.particle_list.append(particle)
-
-    def create_muzzle_flash(self, x, y, angle_deg):
-        for _ in range(3):
-            particle = Particle(self.smoke_textures)
-            particle.center_x = x
-            particle.center_y = y
-            angle_rad = math.radians(angle_deg + random.randint(-15, 15))
-            speed = random.random() * 2.0
-            particle.change_x = math.cos(angle_rad) * speed
-            particle.change_y = math.sin(angle_rad) * speed
-            particle.alpha = 200
-            particle.fade_rate = 15
-            self.particle_list.append(particle)
-
-    def update_enemies_ai(self):
-        BASE_STOP_DISTANCE = 55
-
-        for zombie in self.enemy_list:
-            target_x_player = self.player_sprite.center_x
-            target_y_player = self.player_sprite.center_y
-            target_x_base = self.base_sprite.center_x
-            target_y_base = self.base_sprite.center_y
-
-            dist_to_player = math.sqrt(
-                (target_x_player - zombie.center_x) ** 2 + (target_y_player - zombie.center_y) ** 2)
-            dist_to_base = math.sqrt((target_x_base - zombie.center_x) ** 2 + (target_y_base - zombie.center_y) ** 2)
-
-            if dist_to_player < dist_to_base:
-                angle_rad = math.atan2(target_y_player - zombie.center_y, target_x_player - zombie.center_x)
-                zombie.angle = math.degrees(angle_rad)
-                zombie.change_x = math.cos(angle_rad) * ZOMBIE_SPEED
-                zombie.change_y = math.sin(angle_rad) * ZOMBIE_SPEED
-            else:
-                if dist_to_base < BASE_STOP_DISTANCE:
-                    zombie.change_x = 0
-                    zombie.change_y = 0
-                else:
-                    angle_rad = math.atan2(target_y_base - zombie.center_y, target_x_base - zombie.center_x)
-                    zombie.angle = math.degrees(angle_rad)
-                    zombie.change_x = math.cos(angle_rad) * ZOMBIE_SPEED
-                    zombie.change_y = math.sin(angle_rad) * ZOMBIE_SPEED
+            save_snapshot(SAVE_PATH, self.sim)
+            eventlog.info(f"Игра сохранена: {SAVE_PATH}", tick=self.sim.tick)
+        except OSError as e:
+            eventlog.error("Не удалось сохранить игру", e)
+
+    def load_game(self):
+        if self.replay is not None:
+            return
+        try:
+            sim = load_snapshot(SAVE_PATH)
+            self.save_recording()
+            self.setup(sim=sim)
+            eventlog.info(f"Игра загружена: {SAVE_PATH}", tick=self.sim.tick)
+        except (OSError, ValueError) as e:
+            eventlog.error("Не удалось загрузить игру", e)
+
+    def rewind(self):
+        if self.replay is not None or not self.rewind_ring.rewind(self.sim):
+            return
+        # Запись ввода после перемотки уже не воспроизвести с начала, поэтому она заканчивается здесь.
+        self.save_recording()
+        self.recorder = None
+        self.scheduler.reset()
+        self.apply_quality()
+        eventlog.info(f"Перемотка к тику {self.sim.tick}", tick=self.sim.tick)
 
     def reset_movement(self):
-        self.left = False;
-        self.right = False;
-        self.up = False;
-        self.down = False
-        self.player_sprite.change_x = 0;
-        self.player_sprite.change_y = 0
-
-    def draw_health_bar(self):
-        bar_x = 20
-        bar_y = self.window.height - 40
-        bar_width = 200
-        bar_height = 20
-
-        arcade.draw_lbwh_rectangle_filled(bar_x, bar_y, bar_width, bar_height, arcade.color.GRAY)
-        health_width = (self.hp / PLAYER_MAX_HP) * bar_width
-        if health_width < 0: health_width = 0
-
-        color = arcade.color.GREEN
-        if self.hp < PLAYER_MAX_HP * 0.3:
-            color = arcade.color.RED
-        elif self.hp < PLAYER_MAX_HP * 0.6:
-            color = arcade.color.ORANGE
-
-        arcade.draw_lbwh_rectangle_filled(bar_x, bar_y, health_width, bar_height, color)
-        arcade.draw_lbwh_rectangle_outline(bar_x, bar_y, bar_width, bar_height, arcade.color.WHITE, 2)
-        arcade.draw_text(f" {int(self.hp)}/{PLAYER_MAX_HP}", bar_x + 5, bar_y + 2, arcade.color.WHITE, 12, bold=True)
+        self.handle_input(("reset",))
+
+    def apply_quality(self):
+        sim = self.sim
+        settings = self.governor.settings
+        sim.particles.set_limit(sim.particles.capacity * settings["particles"])
+        sim.effects_scale = settings["effects"]
+        if sim.ai_period_scale != settings["ai_period_scale"]:
+            self.handle_input(("ai_period", settings["ai_period_scale"]))
+
+    def measure_frame(self):
+        # Время кадра — от начала обновления до конца отрисовки, без простоя в ожидании следующего кадра.
+        if self.frame_start is None:
+            return
+        frame_time = time.perf_counter() - self.frame_start
+        self.frame_start = None
+        average = self.governor.average
+        if self.governor.update(frame_time):
+            self.apply_quality()
+            eventlog.info(f"Качество графики: {self.governor.settings['name']} (кадр в среднем {average * 1000:.1f} мс)",
+                          quality=self.governor.level, frame_ms=round(average * 1000, 2))
+
+    def freeze_frame(self):
+        if self.frozen is None:
+            self.frozen = FrozenFrame(self.window.ctx)
+        self.frozen.capture(self.on_draw, self.window.background_color)
+        return self.frozen
+
+    def draw_tracers(self):
+        now = self.sim.time
+        self.tracers = [tracer for tracer in self.tracers if now - tracer[0] < TRACER_TIME]
+        for fired, x0, y0, x1, y1 in self.tracers:
+            alpha = int(255 * (1 - (now - fired) / TRACER_TIME))
+            arcade.draw_line(x0, y0, x1, y1, (255, 240, 160, alpha), 2)
+
+    def inventory_text(self):
+        sim = self.sim
+        text = WEAPON_NAMES[sim.weapon]
+        if WEAPONS[sim.weapon]["max_ammo"] is not None:
+            text += f": {sim.inventory.count(sim.weapon)}"
+        text += f" | Аптечки: {sim.inventory.count('medkit')}"
+        if self.governor.level:
+            text += f" | Качество: {self.governor.settings['name']}"
+        return text
 
     def on_draw(self):
+        profiler = self.profiler
         try:
             self.clear()
-            self.wall_list.draw()
-            self.particle_list.draw()
-            self.enemy_list.draw()
-            self.player_list.draw()
-            self.gun_list.draw()
-            self.bullet_list.draw()
-            self.draw_health_bar()
-            arcade.draw_text("ESC - Пауза | ЛКМ - Огонь", self.window.width - 300, 30, arcade.color.WHITE, 14)
-
-            if time.time() - self.last_hit_time < 0.1:
-                arcade.draw_lbwh_rectangle_filled(0, 0, self.window.width, self.window.height, (255, 0, 0, 50))
+            alpha = 1.0 if self.replay is not None else self.scheduler.alpha
+            with profiler.phase("sync"):
+                self.sync_sprites(alpha)
+            with profiler.phase("draw"):
+                self.decals.flush()
+                self.camera.use()
+                self.chunks.draw()
+                self.decals.draw()
+                self.wall_list.draw()
+                self.item_list.draw()
+                self.particle_renderer.draw(self.sim.particles, alpha, self.view)
+                self.enemy_list.draw()
+                self.player_list.draw()
+                self.gun_list.draw()
+                self.bullet_list.draw()
+                self.draw_tracers()
+            self.window.default_camera.use()
+            with profiler.phase("hud"):
+                self.hud.set_weapon(self.inventory_text())
+                self.hud.draw(self.hp, self.sim.player_max_hp, self.window.width, self.window.height,
+                              flash=self.sim.time - self.sim.last_hit_time < 0.1)
+            self.profiler_overlay.draw(self.window.height)
+            self.measure_frame()
+            if self.launch_time is not None:
+                elapsed = (time.perf_counter() - self.launch_time) * 1000
+                eventlog.info(f"Меню -> игра: {elapsed:.0f} мс", ms=round(elapsed, 1))
+                self.launch_time = None
         except Exception as e:
-            print(f"Критическая ошибка отрисовки: {e}")
+            eventlog.error("Критическая ошибка отрисовки", e)
 
     def on_update(self, delta_time):
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.frame_start = time.perf_counter()
         try:
-            self.can_shoot_timer += delta_time
-
-            self.player_sprite.change_x = 0
-            self.player_sprite.change_y = 0
-
-            if self.up: self.player_sprite.change_y = PLAYER_SPEED
-            if self.down: self.player_sprite.change_y = -PLAYER_SPEED
-            if self.left: self.player_sprite.change_x = -PLAYER_SPEED
-            if self.right: self.player_sprite.change_x = PLAYER_SPEED
-
-            self.physics_engine.update()
-
-            self.pistol_sprite.center_x = self.player_sprite.center_x
-            self.pistol_sprite.center_y = self.player_sprite.center_y
-
-            dx = self.mouse_x - self.player_sprite.center_x
-            dy = self.mouse_y - self.player_sprite.center_y
-            angle_rad = math.atan2(dy, dx)
-            self.pistol_sprite.angle = math.degrees(angle_rad)
-
-            self.time_since_last_spawn += delta_time
-            if self.time_since_last_spawn > SPAWN_RATE:
-                self.spawn_enemy()
-                self.time_since_last_spawn = 0
-
-            self.update_enemies_ai()
-            self.enemy_list.update()
-
-            self.bullet_list.update()
-
-            for bullet in list(self.bullet_list):
-                if (bullet.center_x < 0 or bullet.center_x > self.window.width or
-                        bullet.center_y < 0 or bullet.center_y > self.window.height):
-                    bullet.remove_from_sprite_lists()
-                    continue
-
-                hit_walls = arcade.check_for_collision_with_list(bullet, self.wall_list)
-                if hit_walls:
-                    bullet.remove_from_sprite_lists()
-                    self.create_muzzle_flash(bullet.center_x, bullet.center_y, bullet.angle)
-                    continue
-
-                hit_zombies = arcade.check_for_collision_with_list(bullet, self.enemy_list)
-                if hit_zombies:
-                    bullet.remove_from_sprite_lists()
-                    for zombie in hit_zombies:
-                        self.create_blood_effect(zombie.center_x, zombie.center_y, is_explosion=False)
-                        zombie.hp -= 1
-                        if zombie.hp <= 0:
-                            self.create_blood_effect(zombie.center_x, zombie.center_y, is_explosion=True)
-                            zombie.remove_from_sprite_lists()
-
-            self.particle_list.update()
-
-            hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.enemy_list)
-            if hit_list:
-                if time.time() - self.last_hit_time > HIT_DELAY:
-                    self.hp -= ZOMBIE_DAMAGE
-                    self.last_hit_time = time.time()
-                    print(f"УРОН! Здоровье: {self.hp}")
-
-                    if self.hp <= 0:
-                        game_over = GameOverView()
-                        self.window.show_view(game_over)
-
-            if self.player_sprite.left < 0: self.player_sprite.left = 0
-            if self.player_sprite.right > self.window.width: self.player_sprite.right = self.window.width
-            if self.player_sprite.bottom < 0: self.player_sprite.bottom = 0
-            if self.player_sprite.top > self.window.height: self.player_sprite.top = self.window.height
+            self.follow_mouse()
+            steps = 1 if self.replay is not None else self.scheduler.advance(delta_time)
+            with profiler.phase("update"):
+                for _ in range(steps):
+                    if not self.step_simulation():
+                        return
+            self.decals.fade(steps * self.sim.dt)
+            profiler.count("ticks", steps)
+            profiler.count("zombies", self.sim.zombies.count)
+            profiler.count("bullets", len(self.sim.bullets))
+            profiler.count("particles", self.sim.particles.count)
+            profiler.count("items", self.sim.items.count)
+            profiler.count("chunks", len(self.chunks.loaded))
+            profiler.count("quality", self.governor.level)
 
         except Exception as e:
-            print(f"Ошибка в обновлении: {e}")
-            traceback.print_exc()
+            eventlog.error("Ошибка в обновлении", e)
+
+    def step_simulation(self):
+        if self.replay is not None:
+            if self.sim.tick >= self.replay.length:
+                self.finish_replay()
+                return False
+            self.replay.apply(self.sim.tick, self.input)
+
+        self.sim.step(self.input)
+        self.input.clear_actions()
+        self.rewind_ring.record(self.sim)
+
+        decals = self.governor.settings["decals"]
+        expired = self.sim.particles.drain_expired()
+        if expired is not None and decals:
+            self.decals.stamp_particles(*expired)
+        for event in self.sim.events:
+            if event[0] in LOGGED_EVENTS:
+                eventlog.event(event[0], tick=self.sim.tick, args=list(event[1:]))
+            if event[0] == "player_hit" and event[2] == 0:
+                eventlog.info(f"УРОН! Здоровье: {event[1]}", hp=event[1])
+            elif event[0] == "zombie_killed" and decals:
+                self.decals.stamp_stain(event[1], event[2])
+            elif event[0] == "shot":
+                self.tracers.append((self.sim.time,) + event[1:])
+
+        if self.sim.game_over:
+            if self.replay is not None:
+                self.finish_replay()
+                return False
+            self.end_session()
+            views.show(self.window, "game_over", self.freeze_frame())
+            return False
+        return True
+
+    def finish_replay(self):
+        sim = self.sim
+        eventlog.info(f"Повтор завершён: тиков {sim.tick}, убито {sim.kills}, HP {sim.hp}", tick=sim.tick,
+                      kills=sim.kills, hp=sim.hp)
+        self.end_session()
+        self.window.close()
+
+    def end_session(self):
+        # Профиль и запись ввода пишутся на диск, только когда партия кончилась (гибель, выход в меню, закрытие
+        # окна): вид переиспользуется, и его скрытие на паузе не должно ждать диска.
+        if not self.session_open:
+            return
+        self.session_open = False
+        self.profiler.end_frame()
+        self.profiler.dump_csv()
+        self.save_recording()
+
+    def on_hide_view(self):
+        self.profiler.end_frame()
+
+    def follow_mouse(self):
+        # Камера сдвигается и под неподвижным курсором: прицел пересчитывается в мировые координаты.
+        if self.mouse is None:
+            return
+        x, y = self.to_world(*self.mouse)
+        if (x, y) != (self.input.aim_x, self.input.aim_y):
+            self.handle_input(("aim", x, y))
 
     def on_mouse_motion(self, x, y, dx, dy):
-        self.mouse_x = x
-        self.mouse_y = y
+        self.mouse = (x, y)
+        self.handle_input(("aim",) + self.to_world(x, y))
 
     def on_mouse_press(self, x, y, button, modifiers):
         if button == arcade.MOUSE_BUTTON_LEFT:
-            if self.can_shoot_timer >= SHOOT_DELAY:
-                self.can_shoot_timer = 0
-
-                bullet = arcade.Sprite(self.bullet_texture, scale=1.0)
-
-                dx = x - self.pistol_sprite.center_x
-                dy = y - self.pistol_sprite.center_y
-                angle_rad = math.atan2(dy, dx)
-
-                spawn_dist = 60
-                bullet.center_x = self.pistol_sprite.center_x + math.cos(angle_rad) * spawn_dist
-                bullet.center_y = self.pistol_sprite.center_y + math.sin(angle_rad) * spawn_dist
-
-                bullet.angle = math.degrees(angle_rad)
-                bullet.change_x = math.cos(angle_rad) * BULLET_SPEED
-                bullet.change_y = math.sin(angle_rad) * BULLET_SPEED
-
-                self.bullet_list.append(bullet)
-                self.create_muzzle_flash(bullet.center_x, bullet.center_y, math.degrees(angle_rad))
+            self.mouse = (x, y)
+            self.handle_input(("fire",) + self.to_world(x, y))
 
     def on_key_press(self, key, _modifiers):
         if key == arcade.key.W or key == arcade.key.UP:
-            self.up = True
+            self.handle_input(("key", "up", True))
         elif key == arcade.key.S or key == arcade.key.DOWN:
-            self.down = True
+            self.handle_input(("key", "down", True))
         elif key == arcade.key.A or key == arcade.key.LEFT:
-            self.left = True
+            self.handle_input(("key", "left", True))
         elif key == arcade.key.D or key == arcade.key.RIGHT:
-            self.right = True
+            self.handle_input(("key", "right", True))
+        elif key in WEAPON_KEYS:
+            self.handle_input(("weapon", WEAPON_KEYS[key]))
+        elif key == arcade.key.H:
+            self.handle_input(("medkit",))
+        elif key == arcade.key.F3:
+            self.profiler_overlay.toggle()
+        elif key == arcade.key.F5:
+            self.save_game()
+        elif key == arcade.key.F9:
+            self.load_game()
+        elif key == arcade.key.BACKSPACE:
+            self.rewind()
         elif key == arcade.key.ESCAPE:
-            self.up = False;
-            self.down = False;
-            self.left = False;
-            self.right = False
-            self.player_sprite.change_x = 0;
-            self.player_sprite.change_y = 0
-            pause_view = PauseView(self)
-            self.window.show_view(pause_view)
+            self.reset_movement()
+            views.show(self.window, "pause", self)
 
     def on_key_release(self, key, _modifiers):
         if key == arcade.key.W or key == arcade.key.UP:
-            self.up = False
+            self.handle_input(("key", "up", False))
         elif key == arcade.key.S or key == arcade.key.DOWN:
-            self.down = False
+            self.handle_input(("key", "down", False))
         elif key == arcade.key.A or key == arcade.key.LEFT:
-            self.left = False
+            self.handle_input(("key", "left", False))
         elif key == arcade.key.D or key == arcade.key.RIGHT:
-            self.right = False
+            self.handle_input(("key", "right", False))
+
+
+class NetGameView(GameView):
+    # Сетевой кооператив: мир считает сервер, здесь только его зеркало из снимков и отправка ввода.
+    def __init__(self):
+        super().__init__()
+        self.client = None
+
+    def setup(self, client):
+        self.client = client
+        super().setup(sim=client.mirror)
+        # Снимки приходят реже кадров: долю пути между ними даёт клиент, как планировщик в одиночной игре.
+        self.scheduler = self.client
+
+    def save_game(self):
+        pass
+
+    def load_game(self):
+        pass
+
+    def rewind(self):
+        pass
+
+    def on_update(self, delta_time):
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.frame_start = time.perf_counter()
+        try:
+            self.follow_mouse()
+            with profiler.phase("update"):
+                self.client.send_input(self.input)
+                self.input.clear_actions()
+                events = self.client.poll()
+                sim = self.sim
+                # Частицы не передаются по сети: кровь и вспышки считаются у клиента по событиям.
+                sim.particles.update(delta_time)
+            decals = self.governor.settings["decals"]
+            expired = sim.particles.drain_expired()
+            if expired is not None and decals:
+                self.decals.stamp_particles(*expired)
+            for event in events:
+                if event[0] == "zombie_killed":
+                    sim.create_blood_effect(event[1], event[2], True)
+                    if decals:
+                        self.decals.stamp_stain(event[1], event[2])
+                elif event[0] == "shot":
+                    self.tracers.append((sim.time,) + event[1:])
+            self.decals.fade(delta_time)
+            profiler.count("zombies", sim.zombies.count)
+            profiler.count("bullets", len(sim.bullets))
+            profiler.count("particles", sim.particles.count)
+            profiler.count("items", sim.items.count)
+            profiler.count("net_bytes", round(self.client.bytes_per_tick))
+            profiler.count("quality", self.governor.level)
+
+            if sim.game_over:
+                self.client.close()
+                self.end_session()
+                views.show(self.window, "game_over", self.freeze_frame(), restart=self.reconnect)
+        except Exception as e:
+            eventlog.error("Ошибка в сетевой игре", e)
+
+    def reconnect(self, window):
+        from net import NetClient
+        try:
+            client = NetClient(*self.client.server, view_size=window.size)
+            client.connect()
+        except (OSError, ConnectionError) as e:
+            eventlog.error("Не удалось подключиться", e)
+            views.show(window, "menu")
+            return
+        views.show(window, "net_game", client)
+
+    def on_key_press(self, key, modifiers):
+        # Пауза не останавливает сервер, поэтому ESC в сетевой игре — выход в меню.
+        if key == arcade.key.ESCAPE:
+            self.client.close()
+            self.end_session()
+            views.show(self.window, "menu")
+            return
+        super().on_key_press(key, modifiers)
 
 
 if __name__ == "__main__":
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, "Zombie Defense", fullscreen=True)
-    view = GameView()
-    view.setup()
-    window.show_view(view)
+    # Классы этого файла живут в __main__: без регистрации реестр импортировал бы game второй раз.
+    registry = views.registry(window)
+    for name, view_class in (("game", GameView), ("pause", PauseView), ("game_over", GameOverView),
+                             ("net_game", NetGameView)):
+        registry.register(name, view_class)
+    views.show(window, "game")
     arcade.run()
@@ -0,0 +1,180 @@
+import numpy as np
+
+
+class Horde:
+    # steer_x/steer_y — скорость от последнего решения ИИ, think_tick — тик этого решения.
+    FIELDS = ("x", "y", "prev_x", "prev_y", "change_x", "change_y", "steer_x", "steer_y", "think_tick", "angle", "hp")
+
+    def __init__(self, capacity=256):
+        self.count = 0
+        self.next_id = 0
+        self.high_water = 0
+        # Растёт при любом изменении позиций или порядка зомби: по нему видно, годится ли построенная сетка.
+        self.version = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float64))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.ids)
+
+    def _grow(self):
+        capacity = self.capacity * 2
+        for name in ("ids",) + self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, x, y, hp):
+        if self.count == self.capacity:
+            self._grow()
+        i = self.count
+        self.ids[i] = self.next_id
+        self.x[i] = x
+        self.y[i] = y
+        self.prev_x[i] = x
+        self.prev_y[i] = y
+        self.change_x[i] = 0
+        self.change_y[i] = 0
+        self.steer_x[i] = 0
+        self.steer_y[i] = 0
+        self.think_tick[i] = -np.inf
+        self.angle[i] = 0
+        self.hp[i] = hp
+        self.count += 1
+        self.next_id += 1
+        self.version += 1
+        if self.count > self.high_water:
+            self.high_water = self.count
+        return i
+
+    def clear(self):
+        self.count = 0
+        self.version += 1
+
+    def thinkers(self, tick, player_x, player_y, base_x, base_y, lod, budget):
+        # Уровень детализации по расстоянию до ближайшей цели: (граница, период) по возрастанию границы.
+        # Дальние зомби думают раз в период, разложенные по id на корзины, чтобы нагрузка не шла пачками.
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        dist = np.sqrt(np.minimum((player_x - x) ** 2 + (player_y - y) ** 2, (base_x - x) ** 2 + (base_y - y) ** 2))
+        limits = np.array([limit for limit, _ in lod])
+        periods = np.array([period for _, period in lod])
+        period = periods[np.minimum(np.searchsorted(limits, dist), len(periods) - 1)]
+
+        waited = tick - self.think_tick[:n]
+        due = ((self.ids[:n] + tick) % period == 0) | (waited >= period)
+        indices = np.flatnonzero(due)
+        if len(indices) <= budget:
+            return indices
+        # Сверх бюджета первыми идут самые просроченные, при равенстве — ближние; остальные ждут следующего тика.
+        overdue = waited[indices] / period[indices]
+        order = np.lexsort((dist[indices], -overdue))
+        return np.sort(indices[order[:budget]])
+
+    def steer(self, player_x, player_y, base_x, base_y, speed, stop_distance, navigator=None, indices=None,
+              tick=0):
+        n = self.count
+        if n == 0:
+            return
+        if indices is None:
+            indices = np.arange(n)
+        x = self.x[indices]
+        y = self.y[indices]
+
+        pdx = player_x - x
+        pdy = player_y - y
+        bdx = base_x - x
+        bdy = base_y - y
+        player_d2 = pdx * pdx + pdy * pdy
+        base_d2 = bdx * bdx + bdy * bdy
+
+        chase_player = player_d2 < base_d2
+        dx = np.where(chase_player, pdx, bdx)
+        dy = np.where(chase_player, pdy, bdy)
+        moving = chase_player | (base_d2 >= stop_distance * stop_distance)
+
+        if navigator is not None:
+            flow_x, flow_y, direct = navigator.directions(x, y, chase_player)
+            dx = np.where(direct, dx, flow_x)
+            dy = np.where(direct, dy, flow_y)
+
+        dist = np.sqrt(dx * dx + dy * dy)
+        np.maximum(dist, 1e-9, out=dist)
+        scale = np.where(moving, speed / dist, 0.0)
+        self.steer_x[indices] = dx * scale
+        self.steer_y[indices] = dy * scale
+        self.think_tick[indices] = tick
+
+        heading = np.degrees(np.arctan2(dy, dx))
+        self.angle[indices] = np.where(moving, heading, self.angle[indices])
+        # Кто не думал в этом тике, идёт с прежней скоростью.
+        self.change_x[:n] = self.steer_x[:n]
+        self.change_y[:n] = self.steer_y[:n]
+
+    def separate(self, grid, radius, strength, max_neighbors=8):
+        n = self.count
+        if n < 2 or radius <= 0 or strength <= 0:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        reach = max(1, int(np.ceil(radius / grid.cell_size)))
+        owner, other = grid.pairs(x, y, reach, max_neighbors)
+
+        dx = x[owner] - x[other]
+        dy = y[owner] - y[other]
+        d2 = dx * dx + dy * dy
+        near = np.flatnonzero(d2 < radius * radius)
+        if not len(near):
+            return
+        owner, other, dx, dy, d2 = owner[near], other[near], dx[near], dy[near], d2[near]
+
+        dist = np.sqrt(d2)
+        # Совпавшим зомби нужен хоть какой-то детерминированный разлёт.
+        stacked = dist < 1e-6
+        if np.any(stacked):
+            spread = (owner[stacked] - other[stacked]) * 2.399963
+            dx[stacked] = np.cos(spread)
+            dy[stacked] = np.sin(spread)
+            dist[stacked] = 1.0
+        weight = (1.0 - dist / radius) / dist
+        # Отталкивание симметрично: каждая пара толкает обоих зомби в разные стороны.
+        push_x = np.bincount(owner, weights=dx * weight, minlength=n) - np.bincount(other, weights=dx * weight, minlength=n)
+        push_y = np.bincount(owner, weights=dy * weight, minlength=n) - np.bincount(other, weights=dy * weight, minlength=n)
+
+        norm = np.hypot(push_x, push_y)
+        scale = strength / np.maximum(norm, 1.0)
+        self.change_x[:n] += push_x * scale
+        self.change_y[:n] += push_y * scale
+
+    def move(self, dt):
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.x[:n] += self.change_x[:n] * dt
+        self.y[:n] += self.change_y[:n] * dt
+        self.version += 1
+
+    def remove_dead(self):
+        n = self.count
+        alive = self.hp[:n] > 0
+        keep = int(np.count_nonzero(alive))
+        if keep == n:
+            return
+        for name in ("ids",) + self.FIELDS:
+            array = getattr(self, name)
+            array[:keep] = array[:n][alive]
+        self.count = keep
+        self.version += 1
+
+    def overlapping(self, indices, x, y, width, height, zombie_width, zombie_height):
+        hit = ((np.abs(self.x[indices] - x) * 2 < width + zombie_width) &
+               (np.abs(self.y[indices] - y) * 2 < height + zombie_height) &
+               (self.hp[indices] > 0))
+        return indices[hit]
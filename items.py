@@ -0,0 +1,186 @@
+import numpy as np
+
+from spatial import SpatialGrid
+
+
+class TimerWheel:
+    # Кольцо корзин по тикам: за тик разбирается одна корзина, а не все таймеры.
+    # Таймер дальше одного оборота просто ждёт в своей корзине следующего прохода.
+    def __init__(self, slots=512):
+        self.slots = [[] for _ in range(slots)]
+
+    def schedule(self, key, tick):
+        self.slots[int(tick) % len(self.slots)].append((int(tick), key))
+
+    def advance(self, tick):
+        slot = self.slots[tick % len(self.slots)]
+        if not slot:
+            return []
+        due = [key for when, key in slot if when <= tick]
+        if due:
+            slot[:] = [(when, key) for when, key in slot if when > tick]
+        return due
+
+    def clear(self):
+        for slot in self.slots:
+            slot.clear()
+
+
+class ItemStore:
+    FIELDS = ("x", "y", "prev_x", "prev_y", "expires")
+
+    def __init__(self, cell_size, capacity=64, wheel_slots=512):
+        self.count = 0
+        self.next_id = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.kind = np.zeros(capacity, dtype=np.int64)
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float64))
+        # Индекс по id нужен таймерам и подбору: при удалении перестановкой индексы предметов меняются.
+        self.index_of = {}
+        self.grid = SpatialGrid(cell_size)
+        self.dirty = False
+        self.wheel = TimerWheel(wheel_slots)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.ids)
+
+    def _arrays(self):
+        return ("ids", "kind") + self.FIELDS
+
+    def _grow(self):
+        capacity = self.capacity * 2
+        for name in self._arrays():
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, kind, x, y, expires):
+        if self.count == self.capacity:
+            self._grow()
+        i = self.count
+        item_id = self.next_id
+        self.ids[i] = item_id
+        self.kind[i] = kind
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.expires[i] = expires
+        self.index_of[item_id] = i
+        self.wheel.schedule(item_id, expires)
+        self.count += 1
+        self.next_id += 1
+        self.dirty = True
+        return item_id
+
+    def remove(self, item_id):
+        # Таймер подобранного предмета не снимается: когда он сработает, id уже не найдётся.
+        index = self.index_of.pop(item_id, None)
+        if index is None:
+            return False
+        last = self.count - 1
+        if index != last:
+            for name in self._arrays():
+                array = getattr(self, name)
+                array[index] = array[last]
+            self.index_of[int(self.ids[index])] = index
+        self.count = last
+        self.dirty = True
+        return True
+
+    def expire(self, tick):
+        # Порядок удаления по id, а не по порядку в корзине: раскладка массивов не зависит от истории таймеров.
+        return [item_id for item_id in sorted(self.wheel.advance(tick)) if self.remove(item_id)]
+
+    def query(self, left, bottom, right, top):
+        # Сетка пересобирается лениво: только если предметы появлялись, исчезали или двигались.
+        if self.dirty:
+            n = self.count
+            self.grid.rebuild(self.x[:n], self.y[:n])
+            self.dirty = False
+        return self.grid.query(left, bottom, right, top)
+
+    def near(self, x, y, radius):
+        candidates = self.query(x - radius, y - radius, x + radius, y + radius)
+        if not len(candidates):
+            return candidates
+        d2 = (self.x[candidates] - x) ** 2 + (self.y[candidates] - y) ** 2
+        found = candidates[d2 <= radius * radius]
+        return found[np.argsort(self.ids[found], kind="stable")]
+
+    def store_previous(self):
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+
+    def pull(self, indices, x, y, step):
+        # Подтягивание к точке не дальше чем на step; двигаются только переданные предметы.
+        dx = x - self.x[indices]
+        dy = y - self.y[indices]
+        dist = np.maximum(np.hypot(dx, dy), 1e-9)
+        scale = np.minimum(step / dist, 1.0)
+        self.x[indices] += dx * scale
+        self.y[indices] += dy * scale
+        self.dirty = True
+
+    def restore(self, count, next_id):
+        # После загрузки массивов пересобираются производные структуры: индекс по id, сетка и таймеры.
+        self.count = count
+        self.next_id = next_id
+        self.index_of = {item_id: i for i, item_id in enumerate(self.ids[:count].tolist())}
+        self.wheel.clear()
+        for item_id, expires in zip(self.ids[:count].tolist(), self.expires[:count].tolist()):
+            self.wheel.schedule(item_id, expires)
+        self.dirty = True
+
+    def clear(self):
+        self.count = 0
+        self.index_of = {}
+        self.wheel.clear()
+        self.dirty = True
+
+
+class Inventory:
+    def __init__(self, weapons=()):
+        self.weapons = list(weapons)
+        self.counts = {}
+
+    def has_weapon(self, name):
+        return name in self.weapons
+
+    def add_weapon(self, name):
+        if name in self.weapons:
+            return False
+        self.weapons.append(name)
+        return True
+
+    def count(self, name):
+        return self.counts.get(name, 0)
+
+    def add(self, name, amount, limit=None):
+        # Сколько реально поместилось: сверх limit предмет не берётся.
+        have = self.count(name)
+        added = amount if limit is None else max(0, min(amount, limit - have))
+        if added:
+            self.counts[name] = have + added
+        return added
+
+    def take(self, name, amount=1):
+        have = self.count(name)
+        if have < amount:
+            return False
+        self.counts[name] = have - amount
+        return True
+
+    def to_dict(self):
+        return {"weapons": list(self.weapons), "counts": dict(self.counts)}
+
+    @classmethod
+    def from_dict(cls, data):
+        inventory = cls(data["weapons"])
+        inventory.counts = dict(data["counts"])
+        return inventory
@@ -1,12 +1,20 @@
+import time
+
+# Отсчёт холодного старта начинается до импорта arcade.
+STARTED = time.perf_counter()
+
 import arcade
 import arcade.gui
 import os
 
+import assets
+import eventlog
+import views
+
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 SCREEN_TITLE = "Z ATTACK"
 
-BACKGROUND_PATH = "assets/menu_background.jpg"
 
 DEFAULT_STYLE = {
     "normal": {
@@ -40,12 +48,12 @@ class MenuView(arcade.View):
     def __init__(self):
         super().__init__()
         self.manager = arcade.gui.UIManager()
-        self.manager.enable()
 
-        try:
-            self.background = arcade.load_texture(BACKGROUND_PATH)
-        except FileNotFoundError:
-            self.background = None
+        # Текстуры игры декодируются в фоне, пока открыто меню; фон меню нужен сразу.
+        assets.preload()
+        self.background = assets.get_texture("menu_background")
+        self.warmed = False
+        self.first_frame = True
 
         try:
             arcade.load_font(":resources:fonts/kenney_blocks.ttf")
@@ -53,35 +61,77 @@ class MenuView(arcade.View):
         except:
             self.title_font = "Arial"
 
+        self.title_shadow = arcade.Text("Z ATTACK", 0, 0, arcade.color.BLACK, 80, anchor_x="center",
+                                        font_name=self.title_font)
+        self.title = arcade.Text("Z ATTACK", 0, 0, arcade.color.RED_DEVIL, 80, anchor_x="center",
+                                 font_name=self.title_font)
+        self.title_size = None
+        self.progress_text = arcade.Text("", 20, 20, arcade.color.LIGHT_GRAY, 12)
+
         anchor = arcade.gui.UIAnchorLayout()
-        v_box = arcade.gui.UIBoxLayout(space_between=20)
+        self.v_box = arcade.gui.UIBoxLayout(space_between=20)
 
-        play_btn = arcade.gui.UIFlatButton(text="ИГРАТЬ", width=350, height=50, style=DEFAULT_STYLE)
-        play_btn.on_click = self._start_game_directly
-        v_box.add(play_btn)
+        self.continue_btn = arcade.gui.UIFlatButton(text="ПРОДОЛЖИТЬ", width=350, height=50, style=DEFAULT_STYLE)
+        self.continue_btn.on_click = self._continue_game
 
-        quit_btn = arcade.gui.UIFlatButton(text="ВЫХОД", width=350, height=50, style=DEFAULT_STYLE)
-        quit_btn.on_click = self._quit
-        v_box.add(quit_btn)
+        self.play_btn = arcade.gui.UIFlatButton(text="ИГРАТЬ", width=350, height=50, style=DEFAULT_STYLE)
+        self.play_btn.on_click = self._start_game_directly
 
-        anchor.add(v_box, anchor_x="center_x", anchor_y="center_y", align_y=-80)
+        self.quit_btn = arcade.gui.UIFlatButton(text="ВЫХОД", width=350, height=50, style=DEFAULT_STYLE)
+        self.quit_btn.on_click = self._quit
+
+        anchor.add(self.v_box, anchor_x="center_x", anchor_y="center_y", align_y=-80)
         self.manager.add(anchor)
 
+    def setup(self):
+        # Сохранение могло появиться или пропасть, пока шла игра: набор кнопок собирается при каждом входе.
+        self.v_box.clear()
+        if os.path.exists(assets.SAVE_PATH):
+            self.v_box.add(self.continue_btn)
+        self.v_box.add(self.play_btn)
+        self.v_box.add(self.quit_btn)
+
+    def on_show_view(self):
+        self.manager.enable()
+
+    def on_hide_view(self):
+        self.manager.disable()
+
     def _start_game_directly(self, event):
         try:
-            from game import GameView
-            game = GameView()
-            game.setup()
-            self.window.show_view(game)
+            clicked = time.perf_counter()
+            game = views.show(self.window, "game")
+            game.launch_time = clicked
         except ImportError:
-            print("Файл game.py не найден.")
+            eventlog.error("Файл game.py не найден.")
+        except Exception as e:
+            eventlog.error("Ошибка при запуске игры", e)
+
+    def _continue_game(self, event):
+        try:
+            from snapshot import load_snapshot
+            views.show(self.window, "game", sim=load_snapshot(assets.SAVE_PATH))
         except Exception as e:
-            print(f"Ошибка при запуске игры: {e}")
+            eventlog.error("Ошибка при загрузке сохранения", e)
 
     def _quit(self, event):
         self.window.close()
         arcade.exit()
 
+    def on_update(self, delta_time):
+        if self.warmed:
+            return
+        # Прогрев по одному шагу за кадр, чтобы меню не подтормаживало.
+        if assets.upload_next(self.window.ctx):
+            return
+        if assets.load_progress() < 1:
+            return
+        # Модуль игры, шейдеры и шрифты HUD тоже готовятся здесь, а не по клику «ИГРАТЬ».
+        import game
+        from render import warm_up
+        warm_up(self.window.ctx, game.HUD_HINT)
+        self.warmed = True
+
     def on_draw(self):
         self.clear()
         w = self.window.width
@@ -92,18 +142,28 @@ class MenuView(arcade.View):
         else:
             arcade.set_background_color(arcade.color.DARK_SLATE_GRAY)
 
-        arcade.draw_text("Z ATTACK", w / 2 + 4, h - 154,
-                         arcade.color.BLACK, 80, anchor_x="center", font_name=self.title_font)
-        arcade.draw_text("Z ATTACK", w / 2, h - 150,
-                         arcade.color.RED_DEVIL, 80, anchor_x="center", font_name=self.title_font)
+        if self.title_size != (w, h):
+            self.title_shadow.position = (w / 2 + 4, h - 154)
+            self.title.position = (w / 2, h - 150)
+            self.title_size = (w, h)
+        self.title_shadow.draw()
+        self.title.draw()
+        if not self.warmed:
+            self.progress_text.text = f"Загрузка ресурсов: {assets.load_progress():.0%}"
+            self.progress_text.draw()
 
         self.manager.draw()
 
+        if self.first_frame:
+            elapsed = time.perf_counter() - STARTED
+            eventlog.info(f"Запуск до меню: {elapsed:.2f} с", seconds=round(elapsed, 3))
+            self.first_frame = False
+
 
 def main():
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, fullscreen=True)
-    menu = MenuView()
-    window.show_view(menu)
+    views.registry(window).register("menu", MenuView)
+    views.show(window, "menu")
     arcade.run()
 
 
@@ -0,0 +1,235 @@
+import math
+
+import numpy as np
+
+from spatial import segment_entry
+
+NAV_CELL_SIZE = 32
+UNREACHABLE = 1e9
+# Волна считается по частям: за тик не больше стольких проходов по сетке (проход по миру 3×3 — около 0.15 мс,
+# до схождения нужно около сотни). Пока новое поле не сошлось, зомби идут по прежнему.
+SOLVE_SWEEPS = 12
+
+# Смещения 8 соседей (dx, dy) и стоимость шага к ним.
+_OFFSETS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+_COSTS = [1.0, 1.0, 1.0, 1.0, math.sqrt(2), math.sqrt(2), math.sqrt(2), math.sqrt(2)]
+# Единичные векторы к соседям; последний (индекс -1) — нулевой, для клеток без спуска.
+_UNIT_X = np.array([dx / math.hypot(dx, dy) for dx, dy in _OFFSETS] + [0.0])
+_UNIT_Y = np.array([dy / math.hypot(dx, dy) for dx, dy in _OFFSETS] + [0.0])
+
+
+def segments_hit_box(x0, y0, x1, y1, left, bottom, right, top):
+    return np.isfinite(segment_entry(x0, y0, x1, y1, left, bottom, right, top))
+
+
+class FlowField:
+    def __init__(self, cols, rows, cell_size, origin_x, origin_y):
+        self.cols = cols
+        self.rows = rows
+        self.cell_size = cell_size
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        # Поле хранится с рамкой из недостижимых клеток: соседи берутся срезами без проверок границ.
+        self.padded = np.full((rows + 2, cols + 2), UNREACHABLE)
+        self.dist = self.padded[1:-1, 1:-1]
+        # steps — номер соседа, к которому спуск, или -1; dir_x/dir_y — тот же шаг единичным вектором.
+        self.steps = np.full((rows, cols), -1, dtype=np.int8)
+        self.dir_x = np.zeros((rows, cols))
+        self.dir_y = np.zeros((rows, cols))
+        self.visible = np.ones((rows, cols), dtype=bool)
+        self.goal = np.zeros((rows, cols), dtype=bool)
+        self.blocked = np.zeros((rows, cols), dtype=bool)
+        self.stale = False
+        self.recomputes = 0
+        # Точки цели последнего set_target и те, для которых посчитаны dir_x/dir_y; sweeps — сделано проходов волны.
+        self.targets = None
+        self.solved = None
+        self.sweeps = 0
+        self.best = np.empty((rows, cols))
+        self.candidate = np.empty((rows, cols))
+
+        xs = origin_x + (np.arange(cols) + 0.5) * cell_size
+        ys = origin_y + (np.arange(rows) + 0.5) * cell_size
+        self.center_x, self.center_y = np.meshgrid(xs, ys)
+
+    def set_target(self, goal, blocked, target_x, target_y, occluders):
+        self.goal = goal
+        self.blocked = blocked & ~goal
+        # Целей может быть несколько (игроки в кооперативе): клетка видима, если видна хоть одна цель.
+        visible = np.zeros((self.rows, self.cols), dtype=bool)
+        for x, y in zip(np.atleast_1d(target_x).tolist(), np.atleast_1d(target_y).tolist()):
+            seen = np.ones((self.rows, self.cols), dtype=bool)
+            for left, bottom, right, top in occluders:
+                seen &= ~segments_hit_box(self.center_x, self.center_y, x, y, left, bottom, right, top)
+            visible |= seen
+        self.visible = visible
+        self.targets = [np.atleast_1d(target_x).tolist(), np.atleast_1d(target_y).tolist()]
+        # Расстояния пересчитываются лениво, только когда поле понадобится зомби без прямой видимости.
+        self.stale = True
+        self.sweeps = 0
+
+    @property
+    def solving(self):
+        return self.stale and self.sweeps > 0
+
+    def _neighbors(self):
+        return [self.padded[1 + dy:1 + dy + self.rows, 1 + dx:1 + dx + self.cols] for dx, dy in _OFFSETS]
+
+    def solve(self):
+        return self.relax()
+
+    def relax(self, max_sweeps=None):
+        # Возвращает True, когда волна сошлась и направления обновлены; иначе dir_x/dir_y остаются прежними.
+        dist = self.dist
+        if self.sweeps == 0:
+            dist.fill(UNREACHABLE)
+            dist[self.goal] = 0.0
+        neighbors = self._neighbors()
+        best = self.best
+        candidate = self.candidate
+
+        # Волновой фронт: расстояния релаксируются по всей сетке сразу, пока не перестанут меняться.
+        done = 0
+        while max_sweeps is None or done < max_sweeps:
+            best[...] = dist
+            for neighbor, cost in zip(neighbors, _COSTS):
+                np.add(neighbor, cost, out=candidate)
+                np.minimum(best, candidate, out=best)
+            best[self.blocked] = UNREACHABLE
+            best[self.goal] = 0.0
+            self.sweeps += 1
+            done += 1
+            if np.array_equal(best, dist):
+                self._commit(neighbors)
+                return True
+            dist[...] = best
+        return False
+
+    def _commit(self, neighbors):
+        stacked = np.stack(neighbors)
+        downhill = np.min(stacked, axis=0) < self.dist
+        self.set_steps(np.where(downhill, np.argmin(stacked, axis=0), -1).astype(np.int8))
+        self.solved = self.targets
+        self.stale = False
+        self.sweeps = 0
+        self.recomputes += 1
+
+    def set_steps(self, steps):
+        self.steps = steps
+        self.dir_x = _UNIT_X[steps]
+        self.dir_y = _UNIT_Y[steps]
+
+    def state(self):
+        return {"targets": self.targets, "solved": self.solved, "stale": self.stale, "sweeps": self.sweeps}
+
+    def arrays(self):
+        # Готовое поле хранится номерами шагов; недосчитанная волна — своими расстояниями как есть.
+        arrays = []
+        if self.solved is not None:
+            arrays.append(self.steps)
+        if self.solving:
+            arrays.append(self.dist)
+        return arrays
+
+
+class Navigator:
+    def __init__(self, width, height, margin, clearance, cell_size=NAV_CELL_SIZE):
+        self.cell_size = cell_size
+        self.clearance = clearance
+        self.origin_x = -margin
+        self.origin_y = -margin
+        self.cols = int(math.ceil((width + 2 * margin) / cell_size))
+        self.rows = int(math.ceil((height + 2 * margin) / cell_size))
+        self.base_field = FlowField(self.cols, self.rows, cell_size, self.origin_x, self.origin_y)
+        self.player_field = FlowField(self.cols, self.rows, cell_size, self.origin_x, self.origin_y)
+        self.walls = []
+        self.base = None
+        self.player_cell = None
+        self.dirty = True
+
+    def set_walls(self, walls, base):
+        self.walls = list(walls)
+        self.base = base
+        self.dirty = True
+
+    def cell_of(self, x, y):
+        ix = np.clip(np.floor_divide(np.subtract(x, self.origin_x), self.cell_size), 0, self.cols - 1)
+        iy = np.clip(np.floor_divide(np.subtract(y, self.origin_y), self.cell_size), 0, self.rows - 1)
+        return ix.astype(np.int64), iy.astype(np.int64)
+
+    def _box(self, body):
+        pad = self.clearance
+        return body.left - pad, body.bottom - pad, body.right + pad, body.top + pad
+
+    def _mask(self, boxes):
+        mask = np.zeros((self.rows, self.cols), dtype=bool)
+        for left, bottom, right, top in boxes:
+            x0, y0 = self.cell_of(left, bottom)
+            x1, y1 = self.cell_of(right, top)
+            mask[int(y0):int(y1) + 1, int(x0):int(x1) + 1] = True
+        return mask
+
+    def _target_base(self, *_):
+        obstacles = [self._box(wall) for wall in self.walls if wall is not self.base]
+        goal = self._mask([self._box(self.base)])
+        self.base_field.set_target(goal, self._mask(obstacles), self.base.x, self.base.y, obstacles)
+
+    def _target_player(self, player_x, player_y):
+        ix, iy = self.cell_of(np.atleast_1d(player_x), np.atleast_1d(player_y))
+        boxes = [self._box(wall) for wall in self.walls]
+        goal = np.zeros((self.rows, self.cols), dtype=bool)
+        goal[iy, ix] = True
+        self.player_field.set_target(goal, self._mask(boxes), player_x, player_y, boxes)
+        self.player_cell = tuple(zip(ix.tolist(), iy.tolist()))
+
+    def update(self, player_x, player_y):
+        ix, iy = self.cell_of(np.atleast_1d(player_x), np.atleast_1d(player_y))
+        player_cell = tuple(zip(ix.tolist(), iy.tolist()))
+        if self.dirty:
+            self._target_base()
+        # Пока поле игрока досчитывается, цель не двигается: иначе на бегу волна начиналась бы заново
+        # с каждой новой клетки и не сходилась бы никогда. Досчитав, поле догонит игрока следующим set_target.
+        if self.dirty or (player_cell != self.player_cell and not self.player_field.solving):
+            self._target_player(player_x, player_y)
+        self.dirty = False
+
+    def directions(self, x, y, to_player):
+        ix, iy = self.cell_of(x, y)
+        base = self.base_field
+        player = self.player_field
+        visible = np.where(to_player, player.visible[iy, ix], base.visible[iy, ix])
+        if player.stale and np.any(to_player & ~visible):
+            player.relax(SOLVE_SWEEPS)
+        if base.stale and np.any(~to_player & ~visible):
+            base.relax(SOLVE_SWEEPS)
+
+        dir_x = np.where(to_player, player.dir_x[iy, ix], base.dir_x[iy, ix])
+        dir_y = np.where(to_player, player.dir_y[iy, ix], base.dir_y[iy, ix])
+        # Прямая видимость цели или отсутствие пути — идём напрямую, иначе по полю.
+        direct = visible | ((dir_x == 0) & (dir_y == 0))
+        return dir_x, dir_y, direct
+
+    def state(self):
+        return {"base": self.base_field.state(), "player": self.player_field.state()}
+
+    def arrays(self):
+        return self.base_field.arrays() + self.player_field.arrays()
+
+    def restore(self, state, read):
+        # Поля считаются по частям за несколько тиков, поэтому из сохранения берутся готовые направления
+        # и недосчитанные расстояния, а не пересчитываются заново: загрузка не должна стоить полного решения.
+        # read(dtype, count) отдаёт следующие массивы в порядке arrays().
+        cells = self.rows * self.cols
+        for field, saved, retarget in ((self.base_field, state["base"], self._target_base),
+                                       (self.player_field, state["player"], self._target_player)):
+            steps = read(np.int8, cells).reshape(self.rows, self.cols) if saved["solved"] is not None else None
+            if saved["targets"] is not None:
+                retarget(*saved["targets"])
+            if steps is not None:
+                field.set_steps(steps.copy())
+            field.solved = saved["solved"]
+            field.stale = saved["stale"]
+            field.sweeps = saved["sweeps"]
+            if field.solving:
+                field.dist[...] = read(np.float64, cells).reshape(self.rows, self.cols)
+        self.dirty = state["player"]["targets"] is None or state["base"]["targets"] is None
@@ -0,0 +1,790 @@
+import argparse
+import random
+import socket
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from simulation import BULLET_SIZE, WEAPONS, Body, PlayerInput, Simulation, TickScheduler
+
+NET_VERSION = 1
+DEFAULT_PORT = 27015
+# Мир того же размера, что и в одиночной игре (game.WORLD_WIDTH/HEIGHT), но без импорта arcade на сервере.
+WORLD_WIDTH = 1280 * 3
+WORLD_HEIGHT = 720 * 3
+DEFAULT_VIEW = (1280, 720)
+MAX_PLAYERS = 4
+
+# Снимок всегда помещается в один UDP-пакет без фрагментации: полоса на клиента ограничена сверху
+# MAX_SNAPSHOT_BYTES * TICK_RATE / SNAPSHOT_INTERVAL, сколько бы зомби ни было в мире.
+MAX_SNAPSHOT_BYTES = 1200
+SNAPSHOT_INTERVAL = 2
+# Сколько последних снимков каждого клиента помнится как возможная база для дельты.
+HISTORY_SNAPSHOTS = 32
+BULLET_BUDGET = 200
+ITEM_BUDGET = 240
+MAX_EVENTS = 24
+# Клиенту шлётся только то, что рядом с его игроком: экран клиента плюс запас.
+RELEVANCE_MARGIN = 200
+# Новая сущность важнее любой старой правки, но ближние всё равно идут первыми.
+NEW_STALENESS = 1000
+# На таком расстоянии от игрока важность правки падает вдвое, дальше — как квадрат расстояния.
+PRIORITY_DISTANCE = 200
+INPUT_REDUNDANCY = 3
+# Самопроверка отдельно меряет точность зеркала вблизи игрока: там ошибка заметна глазу.
+SELFTEST_NEAR = 300
+CLIENT_TIMEOUT = 5.0
+HELLO_INTERVAL = 0.2
+STAT_INTERVAL = 5.0
+
+# Координаты передаются в 1/POS_SCALE пикселя в int16, углы — в 1/256 оборота.
+POS_SCALE = 4
+NO_BASELINE = 0xFFFFFFFF
+NO_SLOT = 255
+NO_WEAPON = 255
+INFINITE_AMMO = 0xFFFF
+# Зерно уходит клиентам в WELCOME как uint32.
+MAX_SEED = 0xFFFFFFFF
+WEAPON_IDS = tuple(WEAPONS)
+
+HELLO, WELCOME, INPUT, SNAPSHOT, BYE = range(1, 6)
+_TYPE = struct.Struct("<B")
+_HELLO = struct.Struct("<BHHH")
+_WELCOME = struct.Struct("<BHBIIIdi")
+_INPUT_HEADER = struct.Struct("<BIB")
+_INPUT = struct.Struct("<IBBhh")
+_SNAPSHOT_HEADER = struct.Struct("<BIIH?B")
+_SECTION = struct.Struct("<HHH")
+_COUNT = struct.Struct("<H")
+
+_FLAGS = ("up", "down", "left", "right", "fire", "use_medkit")
+
+_PLAYER = np.dtype([("slot", "u1"), ("x", "<i2"), ("y", "<i2"), ("angle", "u1"), ("hp", "<i2"), ("weapon", "u1"),
+                    ("ammo", "<u2"), ("medkits", "u1")])
+_BULLET = np.dtype([("x", "<i2"), ("y", "<i2"), ("angle", "u1")])
+_EVENT = np.dtype([("kind", "u1"), ("a", "<i2"), ("b", "<i2"), ("c", "<i2"), ("d", "<i2")])
+EVENT_SHOT = 1
+EVENT_KILL = 2
+
+
+def quantize(value):
+    return np.clip(np.round(np.asarray(value, dtype=np.float64) * POS_SCALE), -32768, 32767).astype(np.int32)
+
+
+def quantize_angle(degrees):
+    return (np.round(np.asarray(degrees, dtype=np.float64) / 360 * 256).astype(np.int64) % 256).astype(np.int32)
+
+
+def dequantize(value):
+    return np.asarray(value, dtype=np.float64) / POS_SCALE
+
+
+def dequantize_angle(value):
+    return np.asarray(value, dtype=np.float64) * 360 / 256
+
+
+class EntityState:
+    # Что клиент знает о списке сущностей: id по возрастанию, квантованные поля и тик последней отправки.
+    def __init__(self, ids, values, sent):
+        self.ids = ids
+        self.values = values
+        self.sent = sent
+
+    @classmethod
+    def empty(cls, width):
+        return cls(np.zeros(0, dtype=np.uint32), np.zeros((0, width), dtype=np.int32), np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class EntityCodec:
+    # Дельта-кодирование относительно состояния, которое клиент подтвердил. Первые два поля — x и y:
+    # в короткой записи они идут разницей в int8. Поля из fixed должны совпадать с базой, иначе запись полная.
+    def __init__(self, fields, fixed=()):
+        self.fields = fields
+        self.fixed = [fields.index(name) for name in fixed]
+        self.rest = [i for i in range(2, len(fields)) if fields[i] not in fixed]
+        self.full = np.dtype([("id", "<u4"), ("x", "<i2"), ("y", "<i2")] + [(name, "u1") for name in fields[2:]])
+        self.small = np.dtype([("id", "<u4"), ("dx", "i1"), ("dy", "i1")] + [(fields[i], "u1") for i in self.rest])
+
+    def empty(self):
+        return EntityState.empty(len(self.fields))
+
+    def apply(self, base, removed, ids, values, tick):
+        keep = ~np.isin(base.ids, removed) & ~np.isin(base.ids, ids)
+        all_ids = np.concatenate([base.ids[keep], ids.astype(np.uint32)])
+        order = np.argsort(all_ids, kind="stable")
+        return EntityState(all_ids[order], np.concatenate([base.values[keep], values])[order],
+                           np.concatenate([base.sent[keep], np.full(len(ids), tick, dtype=np.int64)])[order])
+
+    def encode(self, base, ids, values, priority, tick, budget):
+        # Сначала удаления, потом изменённые и новые по убыванию важности, пока не кончится бюджет байт.
+        # Что не влезло, остаётся в базе как есть и уйдёт в следующих снимках.
+        n_base = len(base)
+        pos = np.minimum(np.searchsorted(base.ids, ids), max(n_base - 1, 0))
+        if n_base:
+            known = base.ids[pos] == ids
+            base_values = base.values[pos]
+            staleness = np.where(known, tick - base.sent[pos], NEW_STALENESS)
+        else:
+            known = np.zeros(len(ids), dtype=bool)
+            base_values = np.zeros_like(values)
+            staleness = np.full(len(ids), NEW_STALENESS)
+        changed = ~known | np.any(values != base_values, axis=1)
+
+        budget -= _SECTION.size
+        removed = base.ids[~np.isin(base.ids, ids)]
+        removed = removed[:max(budget, 0) // 4]
+        budget -= len(removed) * 4
+
+        delta = values[:, :2] - base_values[:, :2]
+        small = (known & np.all(np.abs(delta) <= 127, axis=1) &
+                 np.all(values[:, self.fixed] == base_values[:, self.fixed], axis=1))
+        candidates = np.flatnonzero(changed)
+        order = candidates[np.argsort(-(staleness[candidates] * priority[candidates]), kind="stable")]
+        sizes = np.where(small[order], self.small.itemsize, self.full.itemsize)
+        take = order[:np.searchsorted(np.cumsum(sizes), max(budget, 0), side="right")]
+        send_small = np.sort(take[small[take]])
+        send_full = np.sort(take[~small[take]])
+
+        small_records = np.zeros(len(send_small), dtype=self.small)
+        small_records["id"] = ids[send_small]
+        small_records["dx"] = delta[send_small, 0]
+        small_records["dy"] = delta[send_small, 1]
+        for i in self.rest:
+            small_records[self.fields[i]] = values[send_small, i]
+        full_records = np.zeros(len(send_full), dtype=self.full)
+        full_records["id"] = ids[send_full]
+        for i, name in enumerate(self.fields):
+            full_records[name] = values[send_full, i]
+
+        payload = b"".join((_SECTION.pack(len(removed), len(send_small), len(send_full)),
+                            removed.astype("<u4").tobytes(), small_records.tobytes(), full_records.tobytes()))
+        sent = np.concatenate([send_small, send_full])
+        return payload, self.apply(base, removed, ids[sent], values[sent], tick)
+
+    def decode(self, base, data, offset):
+        removed_count, small_count, full_count = _SECTION.unpack_from(data, offset)
+        offset += _SECTION.size
+        removed = np.frombuffer(data, dtype="<u4", count=removed_count, offset=offset)
+        offset += removed.nbytes
+        small = np.frombuffer(data, dtype=self.small, count=small_count, offset=offset)
+        offset += small.nbytes
+        full = np.frombuffer(data, dtype=self.full, count=full_count, offset=offset)
+        offset += full.nbytes
+
+        small_values = base.values[np.searchsorted(base.ids, small["id"])].copy()
+        small_values[:, 0] += small["dx"]
+        small_values[:, 1] += small["dy"]
+        for i in self.rest:
+            small_values[:, i] = small[self.fields[i]]
+        full_values = np.stack([full[name].astype(np.int32) for name in self.fields], axis=1).reshape(-1, len(self.fields))
+        ids = np.concatenate([small["id"], full["id"]])
+        return self.apply(base, removed, ids, np.concatenate([small_values, full_values]), 0), offset
+
+
+ZOMBIES = EntityCodec(("x", "y", "angle", "hp"), fixed=("hp",))
+ITEMS = EntityCodec(("x", "y", "kind"), fixed=("kind",))
+
+
+def encode_input(seq, inp):
+    flags = sum(1 << i for i, name in enumerate(_FLAGS) if getattr(inp, name))
+    weapon = WEAPON_IDS.index(inp.weapon) if inp.weapon in WEAPON_IDS else NO_WEAPON
+    return _INPUT.pack(seq, flags, weapon, int(quantize(inp.aim_x)), int(quantize(inp.aim_y)))
+
+
+class _Lossy:
+    # Отправка с искусственной потерей пакетов: так на localhost проверяются подтверждения и дельты.
+    def __init__(self, sock, loss=0.0, seed=None):
+        self.sock = sock
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.bytes_sent = 0
+
+    def send(self, data, address):
+        self.bytes_sent += len(data)
+        if self.loss and self.rng.random() < self.loss:
+            return
+        try:
+            self.sock.sendto(data, address)
+        except OSError:
+            pass
+
+
+def _receive(sock):
+    packets = []
+    while True:
+        try:
+            data, address = sock.recvfrom(65536)
+        except (BlockingIOError, InterruptedError):
+            return packets
+        except ConnectionResetError:
+            # Windows сообщает так о недоставленном раньше пакете; на UDP это не ошибка.
+            continue
+        packets.append((data, address))
+
+
+class ClientSlot:
+    def __init__(self, address, slot, view_size, now):
+        self.address = address
+        self.slot = slot
+        self.view_size = view_size
+        self.input = PlayerInput()
+        self.last_seq = -1
+        self.last_seen = now
+        self.ack = NO_BASELINE
+        self.history = {}
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.bytes_sent = 0
+        self.ticks = 0
+        self.max_snapshot = 0
+        self.report_bytes = 0
+        self.report_ticks = 0
+
+    def baseline(self):
+        return self.history.get(self.ack)
+
+    def remember(self, tick, state):
+        self.history[tick] = state
+        for old in [t for t in self.history if t < tick - HISTORY_SNAPSHOTS * SNAPSHOT_INTERVAL]:
+            del self.history[old]
+
+    def relevance(self, body):
+        half_width = self.view_size[0] / 2 + RELEVANCE_MARGIN
+        half_height = self.view_size[1] / 2 + RELEVANCE_MARGIN
+        return body.x - half_width, body.y - half_height, body.x + half_width, body.y + half_height
+
+
+class NetServer:
+    def __init__(self, host="0.0.0.0", port=DEFAULT_PORT, seed=None, width=WORLD_WIDTH, height=WORLD_HEIGHT,
+                 params=None, loss=0.0, log=print):
+        if seed is not None and not 0 <= seed <= MAX_SEED:
+            raise ValueError(f"Зерно должно быть от 0 до {MAX_SEED}: {seed}")
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        self.out = _Lossy(self.sock, loss, seed)
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.params = params
+        self.log = log
+        self.clients = {}
+        self.sim = None
+        self.malformed = 0
+        self.last_report = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        # Новая партия. Кто остался подключён, сохраняет свой слот; снимки ему идут заново с полного.
+        self.sim = Simulation(self.width, self.height, seed=self.seed, params=self.params, view_size=DEFAULT_VIEW)
+        for client in self.clients.values():
+            while len(self.sim.players) <= client.slot:
+                self.sim.add_player()
+            client.input = PlayerInput()
+            client.ack = NO_BASELINE
+            client.history = {}
+            client.events.clear()
+
+    def close(self):
+        self.sock.close()
+
+    def poll(self, now=None):
+        now = time.perf_counter() if now is None else now
+        for data, address in _receive(self.sock):
+            if not data:
+                continue
+            kind = data[0]
+            # Битый или чужой датаграм отбрасывается сам по себе и не должен ронять цикл сервера.
+            try:
+                if kind == HELLO and len(data) >= _HELLO.size:
+                    self.on_hello(data, address, now)
+                elif kind == INPUT and len(data) >= _INPUT_HEADER.size and address in self.clients:
+                    self.on_input(self.clients[address], data, now)
+                elif kind == BYE and address in self.clients:
+                    self.drop(address, "вышел")
+            except struct.error:
+                self.malformed += 1
+        for address in [a for a, client in self.clients.items() if now - client.last_seen > CLIENT_TIMEOUT]:
+            self.drop(address, "не отвечает")
+
+    def on_hello(self, data, address, now):
+        _, version, view_width, view_height = _HELLO.unpack_from(data)
+        if version != NET_VERSION:
+            return
+        if self.sim.game_over:
+            self.reset()
+        client = self.clients.get(address)
+        if client is None:
+            taken = {c.slot for c in self.clients.values()}
+            free = [slot for slot in range(len(self.sim.players)) if slot not in taken]
+            if free:
+                slot = free[0]
+            elif len(self.sim.players) < MAX_PLAYERS:
+                slot = self.sim.add_player()
+            else:
+                self.out.send(_WELCOME.pack(WELCOME, NET_VERSION, NO_SLOT, 0, 0, 0, 0.0, 0), address)
+                return
+            client = ClientSlot(address, slot, (view_width, view_height), now)
+            self.clients[address] = client
+            self.log(f"Игрок {slot + 1} подключился: {address[0]}:{address[1]}")
+        client.last_seen = now
+        sim = self.sim
+        self.out.send(_WELCOME.pack(WELCOME, NET_VERSION, client.slot, sim.width, sim.height, sim.seed, sim.dt,
+                                    int(sim.player_max_hp)), address)
+
+    def on_input(self, client, data, now):
+        _, ack, count = _INPUT_HEADER.unpack_from(data)
+        if len(data) < _INPUT_HEADER.size + count * _INPUT.size:
+            self.malformed += 1
+            return
+        client.last_seen = now
+        if ack != NO_BASELINE and ack in client.history and (client.ack == NO_BASELINE or ack > client.ack):
+            client.ack = ack
+        inp = client.input
+        # Ввод приходит с повтором последних кадров: потерянный пакет с выстрелом перекрывается следующим.
+        for i in range(count):
+            seq, flags, weapon, aim_x, aim_y = _INPUT.unpack_from(data, _INPUT_HEADER.size + i * _INPUT.size)
+            if seq <= client.last_seq:
+                continue
+            client.last_seq = seq
+            for bit, name in enumerate(_FLAGS[:4]):
+                setattr(inp, name, bool(flags & (1 << bit)))
+            inp.fire = inp.fire or bool(flags & (1 << 4))
+            inp.use_medkit = inp.use_medkit or bool(flags & (1 << 5))
+            if weapon != NO_WEAPON and weapon < len(WEAPON_IDS):
+                inp.weapon = WEAPON_IDS[weapon]
+            inp.aim_x = float(dequantize(aim_x))
+            inp.aim_y = float(dequantize(aim_y))
+
+    def drop(self, address, reason):
+        client = self.clients.pop(address)
+        self.log(f"Игрок {client.slot + 1} {reason}")
+        if not self.clients:
+            self.reset()
+
+    def step(self):
+        sim = self.sim
+        if not self.clients or sim.game_over:
+            return
+        inputs = [None] * len(sim.players)
+        for client in self.clients.values():
+            inputs[client.slot] = client.input
+        sim.step(inputs)
+        for client in self.clients.values():
+            client.input.clear_actions()
+            client.ticks += 1
+            client.report_ticks += 1
+        self.collect_events()
+        if sim.tick % SNAPSHOT_INTERVAL == 0 or sim.game_over:
+            for client in self.clients.values():
+                self.send_snapshot(client)
+
+    def collect_events(self):
+        for event in self.sim.events:
+            if event[0] == "shot":
+                record = (EVENT_SHOT,) + tuple(int(v) for v in quantize(event[1:5]))
+            elif event[0] == "zombie_killed":
+                record = (EVENT_KILL,) + tuple(int(v) for v in quantize(event[1:3])) + (0, 0)
+            else:
+                continue
+            for client in self.clients.values():
+                client.events.append(record)
+
+    def _relevant(self, x, y, box):
+        left, bottom, right, top = box
+        return np.flatnonzero((x >= left) & (x <= right) & (y >= bottom) & (y <= top))
+
+    def _priority(self, x, y, body):
+        return 1.0 / (1.0 + (np.hypot(x - body.x, y - body.y) / PRIORITY_DISTANCE) ** 2)
+
+    def send_snapshot(self, client):
+        sim = self.sim
+        body = sim.players[client.slot].body
+        box = client.relevance(body)
+        base = client.baseline()
+        tick = sim.tick
+
+        players = np.zeros(len(sim.players), dtype=_PLAYER)
+        for i, player in enumerate(sim.players):
+            max_ammo = WEAPONS[player.weapon]["max_ammo"]
+            players[i] = (i, quantize(player.body.x), quantize(player.body.y), quantize_angle(player.aim_angle),
+                          int(np.clip(round(player.hp), -32768, 32767)), WEAPON_IDS.index(player.weapon),
+                          INFINITE_AMMO if max_ammo is None else player.inventory.count(player.weapon),
+                          player.inventory.count("medkit"))
+        parts = [_SNAPSHOT_HEADER.pack(SNAPSHOT, tick, NO_BASELINE if base is None else client.ack,
+                                       min(sim.kills, 0xFFFF), sim.game_over, len(players)), players.tobytes()]
+
+        bx = np.array([bullet.x for bullet in sim.bullets])
+        by = np.array([bullet.y for bullet in sim.bullets])
+        near = self._relevant(bx, by, box) if len(bx) else np.zeros(0, dtype=np.int64)
+        near = near[np.argsort(np.hypot(bx[near] - body.x, by[near] - body.y), kind="stable")]
+        near = near[:BULLET_BUDGET // _BULLET.itemsize]
+        bullets = np.zeros(len(near), dtype=_BULLET)
+        bullets["x"] = quantize(bx[near])
+        bullets["y"] = quantize(by[near])
+        bullets["angle"] = quantize_angle([sim.bullets[i].angle for i in near.tolist()])
+        parts += [_COUNT.pack(len(bullets)), bullets.tobytes()]
+
+        events = np.array(list(client.events), dtype=_EVENT) if client.events else np.zeros(0, dtype=_EVENT)
+        client.events.clear()
+        parts += [_COUNT.pack(len(events)), events.tobytes()]
+
+        items = sim.items
+        k = items.count
+        near = self._relevant(items.x[:k], items.y[:k], box)
+        near = near[np.argsort(items.ids[near], kind="stable")]
+        item_values = np.stack([quantize(items.x[near]), quantize(items.y[near]), items.kind[near].astype(np.int32)],
+                               axis=1).reshape(-1, 3)
+        item_bytes, item_state = ITEMS.encode(base[1] if base else ITEMS.empty(), items.ids[near].astype(np.uint32),
+                                              item_values, self._priority(items.x[near], items.y[near], body), tick,
+                                              ITEM_BUDGET)
+        parts.append(item_bytes)
+
+        zombies = sim.zombies
+        n = zombies.count
+        near = self._relevant(zombies.x[:n], zombies.y[:n], box)
+        near = near[np.argsort(zombies.ids[near], kind="stable")]
+        zombie_values = np.stack([quantize(zombies.x[near]), quantize(zombies.y[near]),
+                                  quantize_angle(zombies.angle[near]),
+                                  np.clip(zombies.hp[near], 0, 255).astype(np.int32)], axis=1).reshape(-1, 4)
+        budget = MAX_SNAPSHOT_BYTES - sum(len(part) for part in parts)
+        zombie_bytes, zombie_state = ZOMBIES.encode(base[0] if base else ZOMBIES.empty(),
+                                                    zombies.ids[near].astype(np.uint32), zombie_values,
+                                                    self._priority(zombies.x[near], zombies.y[near], body), tick,
+                                                    budget)
+        parts.append(zombie_bytes)
+
+        data = b"".join(parts)
+        client.remember(tick, (zombie_state, item_state))
+        client.bytes_sent += len(data)
+        client.report_bytes += len(data)
+        client.max_snapshot = max(client.max_snapshot, len(data))
+        self.out.send(data, client.address)
+
+    def report(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if now - self.last_report < STAT_INTERVAL:
+            return
+        self.last_report = now
+        for client in self.clients.values():
+            per_tick = client.report_bytes / max(client.report_ticks, 1)
+            self.log(f"Игрок {client.slot + 1}: {per_tick:.0f} Б/тик, снимок до {client.max_snapshot} Б, "
+                     f"подтверждён тик {client.ack if client.ack != NO_BASELINE else '-'}")
+            client.report_bytes = 0
+            client.report_ticks = 0
+        if self.malformed:
+            self.log(f"Отброшено битых пакетов: {self.malformed}")
+            self.malformed = 0
+
+    def run(self):
+        scheduler = TickScheduler(self.sim.dt)
+        self.log(f"Сервер Z ATTACK слушает {self.address[0]}:{self.address[1]}")
+        last = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            self.poll(now)
+            for _ in range(scheduler.advance(now - last)):
+                self.step()
+            last = now
+            self.report(now)
+            time.sleep(max(0.0, self.sim.dt - scheduler.accumulator) / 2)
+
+
+class NetClient:
+    def __init__(self, host, port=DEFAULT_PORT, view_size=DEFAULT_VIEW, loss=0.0, seed=None):
+        self.server = (socket.gethostbyname(host), port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("0.0.0.0", 0))
+        self.sock.setblocking(False)
+        self.out = _Lossy(self.sock, loss, seed)
+        self.view_size = tuple(int(v) for v in view_size)
+        self.slot = None
+        self.mirror = None
+        self.seq = 0
+        self.inputs = deque(maxlen=INPUT_REDUNDANCY)
+        self.history = {}
+        self.ack = NO_BASELINE
+        self.tick = -1
+        self.last_hello = 0.0
+        self.last_snapshot_time = None
+        self.bytes_received = 0
+        self.bytes_per_tick = 0.0
+        self.bullet_pool = []
+
+    @property
+    def connected(self):
+        return self.mirror is not None
+
+    @property
+    def alpha(self):
+        # Между снимками зеркало интерполируется, как у планировщика в одиночной игре.
+        if self.last_snapshot_time is None:
+            return 1.0
+        period = SNAPSHOT_INTERVAL * self.mirror.dt
+        return min((time.perf_counter() - self.last_snapshot_time) / period, 1.0)
+
+    def hello(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if now - self.last_hello >= HELLO_INTERVAL:
+            self.last_hello = now
+            self.out.send(_HELLO.pack(HELLO, NET_VERSION, *self.view_size), self.server)
+
+    def connect(self, timeout=5.0):
+        deadline = time.perf_counter() + timeout
+        while not self.connected:
+            if time.perf_counter() > deadline:
+                raise ConnectionError(f"Сервер {self.server[0]}:{self.server[1]} не отвечает")
+            self.hello()
+            self.poll()
+            time.sleep(0.01)
+
+    def close(self):
+        if self.connected:
+            self.out.send(_TYPE.pack(BYE), self.server)
+        self.sock.close()
+
+    def send_input(self, inp):
+        if not self.connected:
+            self.hello()
+            return
+        self.seq += 1
+        self.inputs.append(encode_input(self.seq, inp))
+        self.out.send(_INPUT_HEADER.pack(INPUT, self.ack, len(self.inputs)) + b"".join(self.inputs), self.server)
+
+    def poll(self):
+        events = []
+        for data, address in _receive(self.sock):
+            if address != self.server or not data:
+                continue
+            if data[0] == WELCOME and len(data) >= _WELCOME.size:
+                self.on_welcome(data)
+            elif data[0] == SNAPSHOT and self.connected:
+                self.bytes_received += len(data)
+                events.extend(self.on_snapshot(data))
+        return events
+
+    def on_welcome(self, data):
+        _, version, slot, width, height, seed, dt, max_hp = _WELCOME.unpack_from(data)
+        if slot == NO_SLOT:
+            raise ConnectionError("Сервер заполнен")
+        if self.mirror is not None:
+            return
+        self.slot = slot
+        self.mirror = Simulation(width, height, seed=seed, dt=dt, params={"player_max_hp": max_hp})
+        self.mirror.zombies.clear()
+
+    def on_snapshot(self, data):
+        tick, baseline, kills, game_over, player_count = _SNAPSHOT_HEADER.unpack_from(data)[1:]
+        if baseline == NO_BASELINE and tick < self.tick:
+            # Сервер начал новую партию, не отключая нас: тики пошли с начала, старые базы не годятся.
+            self.history = {}
+            self.tick = -1
+        if baseline == NO_BASELINE:
+            base = (ZOMBIES.empty(), ITEMS.empty())
+        elif baseline in self.history:
+            base = self.history[baseline]
+        else:
+            # Базы уже нет: снимок не собрать, сервер перейдёт на более свежую по следующему подтверждению.
+            return []
+        offset = _SNAPSHOT_HEADER.size
+        players = np.frombuffer(data, dtype=_PLAYER, count=player_count, offset=offset)
+        offset += players.nbytes
+        (count,) = _COUNT.unpack_from(data, offset)
+        bullets = np.frombuffer(data, dtype=_BULLET, count=count, offset=offset + _COUNT.size)
+        offset += _COUNT.size + bullets.nbytes
+        (count,) = _COUNT.unpack_from(data, offset)
+        events = np.frombuffer(data, dtype=_EVENT, count=count, offset=offset + _COUNT.size)
+        offset += _COUNT.size + events.nbytes
+        item_state, offset = ITEMS.decode(base[1], data, offset)
+        zombie_state, offset = ZOMBIES.decode(base[0], data, offset)
+
+        self.history[tick] = (zombie_state, item_state)
+        for old in [t for t in self.history if t < tick - HISTORY_SNAPSHOTS * SNAPSHOT_INTERVAL]:
+            del self.history[old]
+        if tick <= self.tick:
+            # Запоздавший снимок годится как база, но зеркало уже новее.
+            return []
+        if self.tick >= 0:
+            self.bytes_per_tick = len(data) / (tick - self.tick)
+        self.ack = tick
+        self.tick = tick
+        self.last_snapshot_time = time.perf_counter()
+        self.apply(tick, kills, game_over, players, bullets, zombie_state, item_state)
+
+        decoded = []
+        for kind, a, b, c, d in events.tolist():
+            if kind == EVENT_SHOT:
+                decoded.append(("shot",) + tuple(dequantize([a, b, c, d]).tolist()))
+            elif kind == EVENT_KILL:
+                decoded.append(("zombie_killed",) + tuple(dequantize([a, b]).tolist()))
+        return decoded
+
+    def apply(self, tick, kills, game_over, players, bullets, zombie_state, item_state):
+        sim = self.mirror
+        sim.tick = tick
+        sim.time = tick * sim.dt
+        sim.kills = kills
+        sim.game_over = game_over
+
+        # Свой игрок в зеркале всегда первый: HUD и камера работают с ним, как в одиночной игре.
+        order = sorted(range(len(players)), key=lambda i: (players[i]["slot"] != self.slot, players[i]["slot"]))
+        while len(sim.players) < len(players):
+            sim.add_player()
+        del sim.players[len(players):]
+        for player, record in zip(sim.players, players[order]):
+            body = player.body
+            body.prev_x, body.prev_y = body.x, body.y
+            body.x = float(dequantize(record["x"]))
+            body.y = float(dequantize(record["y"]))
+            player.aim_angle = float(dequantize_angle(record["angle"]))
+            if record["hp"] < player.hp:
+                player.last_hit_time = sim.time
+            player.hp = int(record["hp"])
+            player.weapon = WEAPON_IDS[record["weapon"]]
+            player.inventory.add_weapon(player.weapon)
+            if record["ammo"] != INFINITE_AMMO:
+                player.inventory.counts[player.weapon] = int(record["ammo"])
+            player.inventory.counts["medkit"] = int(record["medkits"])
+
+        zombies = sim.zombies
+        old_ids = zombies.ids[:zombies.count].copy()
+        old_x = zombies.x[:zombies.count].copy()
+        old_y = zombies.y[:zombies.count].copy()
+        n = len(zombie_state)
+        while zombies.capacity < n:
+            zombies._grow()
+        zombies.count = n
+        zombies.ids[:n] = zombie_state.ids
+        values = zombie_state.values
+        zombies.x[:n] = dequantize(values[:, 0])
+        zombies.y[:n] = dequantize(values[:, 1])
+        zombies.angle[:n] = dequantize_angle(values[:, 2])
+        zombies.hp[:n] = values[:, 3]
+        # Для интерполяции берётся прошлое положение того же зомби, новым — текущее.
+        pos = np.minimum(np.searchsorted(old_ids, zombie_state.ids), max(len(old_ids) - 1, 0))
+        known = old_ids[pos] == zombie_state.ids if len(old_ids) else np.zeros(n, dtype=bool)
+        zombies.prev_x[:n] = np.where(known, old_x[pos] if len(old_ids) else 0, zombies.x[:n])
+        zombies.prev_y[:n] = np.where(known, old_y[pos] if len(old_ids) else 0, zombies.y[:n])
+
+        items = sim.items
+        k = len(item_state)
+        while items.capacity < k:
+            items._grow()
+        items.count = k
+        items.ids[:k] = item_state.ids
+        items.x[:k] = items.prev_x[:k] = dequantize(item_state.values[:, 0])
+        items.y[:k] = items.prev_y[:k] = dequantize(item_state.values[:, 1])
+        items.kind[:k] = item_state.values[:, 2]
+        items.dirty = True
+
+        self.bullet_pool.extend(sim.bullets)
+        sim.bullets = []
+        period = SNAPSHOT_INTERVAL * sim.dt
+        for x, y, angle in zip(dequantize(bullets["x"]).tolist(), dequantize(bullets["y"]).tolist(),
+                               dequantize_angle(bullets["angle"]).tolist()):
+            bullet = self.bullet_pool.pop() if self.bullet_pool else Body(0, 0, BULLET_SIZE)
+            bullet.x, bullet.y, bullet.angle = x, y, angle
+            # У пуль нет id: прошлое положение восстанавливается по скорости полёта.
+            bullet.prev_x = x - np.cos(np.radians(angle)) * sim.bullet_speed * period
+            bullet.prev_y = y - np.sin(np.radians(angle)) * sim.bullet_speed * period
+            sim.bullets.append(bullet)
+
+
+def selftest(clients=2, ticks=1200, zombies=2000, loss=0.0, log=print):
+    from bot import Bot
+
+    params = {"spawn_rate": 0.5, "player_max_hp": 10 ** 6}
+    server = NetServer("127.0.0.1", 0, seed=1, params=params, loss=loss, log=lambda message: None)
+    rng = np.random.default_rng(1)
+    for x, y in zip(rng.uniform(0, server.width, zombies).tolist(), rng.uniform(0, server.height, zombies).tolist()):
+        server.sim.zombies.add(x, y, server.sim.zombie_max_hp)
+
+    peers = [NetClient("127.0.0.1", server.address[1], loss=loss, seed=i + 2) for i in range(clients)]
+    while not all(peer.connected for peer in peers):
+        for peer in peers:
+            peer.hello(time.perf_counter() + HELLO_INTERVAL * 2)
+        server.poll()
+        for peer in peers:
+            peer.poll()
+    bots = [Bot(peer.mirror) for peer in peers]
+
+    errors = [[] for _ in peers]
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for peer, bot in zip(peers, bots):
+            peer.send_input(bot.update(peer.mirror))
+        server.poll()
+        server.step()
+        for i, peer in enumerate(peers):
+            peer.poll()
+            if peer.tick == server.sim.tick:
+                mirror = peer.mirror.zombies
+                horde = server.sim.zombies
+                ids, a, b = np.intersect1d(mirror.ids[:mirror.count], horde.ids[:horde.count], return_indices=True)
+                error = np.hypot(mirror.x[a] - horde.x[b], mirror.y[a] - horde.y[b])
+                near = np.hypot(horde.x[b] - peer.mirror.player.x, horde.y[b] - peer.mirror.player.y) < SELFTEST_NEAR
+                if len(ids):
+                    errors[i].append((float(np.mean(error)), float(np.mean(error[near])) if np.any(near) else 0.0))
+    elapsed = time.perf_counter() - start
+
+    log(f"Тиков: {server.sim.tick}, зомби на сервере: {server.sim.zombies.count}, потери: {loss:.0%}, "
+        f"{ticks / elapsed:.0f} тиков/с")
+    for i, (peer, client) in enumerate(zip(peers, sorted(server.clients.values(), key=lambda c: c.slot))):
+        mean_error = np.mean(errors[i], axis=0) if errors[i] else (float("nan"), float("nan"))
+        ticks_played = max(client.ticks, 1)
+        log(f"Клиент {i + 1}: {client.bytes_sent / ticks_played:.0f} Б/тик, "
+            f"дошло {peer.bytes_received / ticks_played:.0f} Б/тик, снимок до {client.max_snapshot} Б, "
+            f"зомби в зеркале: {peer.mirror.zombies.count}, "
+            f"ошибка позиции: {mean_error[0]:.2f} px, в {SELFTEST_NEAR} px от игрока: {mean_error[1]:.2f} px")
+    for peer in peers:
+        peer.close()
+    server.close()
+    return server, peers
+
+
+def run_client(host, port):
+    import arcade
+    import views
+    from game import SCREEN_HEIGHT, SCREEN_WIDTH
+
+    client = NetClient(host, port, view_size=(SCREEN_WIDTH, SCREEN_HEIGHT))
+    client.connect()
+    window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, f"Z ATTACK — игрок {client.slot + 1}")
+    views.show(window, "net_game", client)
+    arcade.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Кооператив Z ATTACK по сети (UDP)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    server = commands.add_parser("server", help="запустить сервер")
+    server.add_argument("--host", default="0.0.0.0")
+    server.add_argument("--port", type=int, default=DEFAULT_PORT)
+    server.add_argument("--seed", type=int, default=None)
+    client = commands.add_parser("client", help="подключиться к серверу и играть")
+    client.add_argument("host", nargs="?", default="127.0.0.1")
+    client.add_argument("--port", type=int, default=DEFAULT_PORT)
+    test = commands.add_parser("selftest", help="сервер и боты-клиенты на localhost, замер трафика")
+    test.add_argument("--clients", type=int, default=2)
+    test.add_argument("--ticks", type=int, default=1200)
+    test.add_argument("--zombies", type=int, default=2000, help="сколько зомби добавить в мир сразу")
+    test.add_argument("--loss", type=float, default=0.0, help="доля теряемых пакетов")
+    args = parser.parse_args()
+
+    if args.command == "server":
+        if args.seed is not None and not 0 <= args.seed <= MAX_SEED:
+            parser.error(f"--seed должно быть от 0 до {MAX_SEED}")
+        NetServer(args.host, args.port, seed=args.seed).run()
+    elif args.command == "client":
+        run_client(args.host, args.port)
+    else:
+        selftest(args.clients, args.ticks, args.zombies, args.loss)
+
+
+if __name__ == "__main__":
+    main()
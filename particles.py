@@ -0,0 +1,87 @@
+import numpy as np
+
+MAX_PARTICLES = 4096
+
+
+class ParticleSystem:
+    FIELDS = ("x", "y", "prev_x", "prev_y", "change_x", "change_y", "angle", "change_angle", "alpha", "fade_rate",
+              "size")
+
+    def __init__(self, capacity=MAX_PARTICLES):
+        self.count = 0
+        self.limit = capacity
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float32))
+        # Отмершие частицы копятся здесь, только пока кто-то их забирает (см. track_expired).
+        self.expired = None
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.kind)
+
+    def set_limit(self, limit):
+        self.limit = max(0, min(int(limit), self.capacity))
+
+    def emit(self, kind, x, y, change_x, change_y, size, change_angle=0.0, alpha=255, fade_rate=600):
+        # Сверх лимита частицы просто не создаются: эффект беднеет, а время кадра не растёт.
+        free = self.limit - self.count
+        total = len(change_x)
+        if free <= 0 or total == 0:
+            return 0
+        n = min(total, free)
+        start = self.count
+        end = start + n
+        self.kind[start:end] = kind
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.prev_x[start:end] = x
+        self.prev_y[start:end] = y
+        self.change_x[start:end] = change_x[:n]
+        self.change_y[start:end] = change_y[:n]
+        self.size[start:end] = size[:n]
+        self.angle[start:end] = 0
+        self.change_angle[start:end] = change_angle if np.isscalar(change_angle) else change_angle[:n]
+        self.alpha[start:end] = alpha
+        self.fade_rate[start:end] = fade_rate
+        self.count = end
+        return n
+
+    def track_expired(self, enabled=True):
+        self.expired = [] if enabled else None
+
+    def drain_expired(self):
+        # Вид, координаты и размер частиц, отмерших с прошлого вызова.
+        if not self.expired:
+            return None
+        batches, self.expired = self.expired, []
+        return tuple(np.concatenate(column) for column in zip(*batches))
+
+    def update(self, dt):
+        n = self.count
+        if n == 0:
+            return
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.x[:n] += self.change_x[:n] * dt
+        self.y[:n] += self.change_y[:n] * dt
+        self.angle[:n] += self.change_angle[:n] * dt
+        self.alpha[:n] -= self.fade_rate[:n] * dt
+
+        alive = self.alpha[:n] > 0
+        keep = int(np.count_nonzero(alive))
+        if keep == n:
+            return
+        if self.expired is not None:
+            dead = ~alive
+            self.expired.append((self.kind[:n][dead], self.x[:n][dead], self.y[:n][dead], self.size[:n][dead]))
+        for name in ("kind",) + self.FIELDS:
+            array = getattr(self, name)
+            array[:keep] = array[:n][alive]
+        self.count = keep
+
+    def clear(self):
+        self.count = 0
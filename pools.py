@@ -0,0 +1,58 @@
+class ObjectPool:
+    def __init__(self, factory, prealloc=0):
+        self.factory = factory
+        self.free = [factory() for _ in range(prealloc)]
+        self.created = prealloc
+        self.in_use = 0
+        self.high_water = 0
+
+    def acquire(self):
+        if self.free:
+            item = self.free.pop()
+        else:
+            item = self.factory()
+            self.created += 1
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return item
+
+    def release(self, item):
+        self.in_use -= 1
+        self.free.append(item)
+
+
+class SpritePool(ObjectPool):
+    def __init__(self, sprite_list, factory, prealloc=0):
+        self.sprite_list = sprite_list
+        self.sprite_factory = factory
+        self.active = {}
+        super().__init__(self._create, prealloc)
+        for sprite in self.free:
+            sprite.visible = False
+
+    def _create(self):
+        sprite = self.sprite_factory()
+        self.sprite_list.append(sprite)
+        return sprite
+
+    def get(self, key):
+        sprite = self.active.get(key)
+        if sprite is None:
+            sprite = self.acquire()
+            sprite.visible = True
+            self.active[key] = sprite
+        return sprite
+
+    def release_key(self, key):
+        sprite = self.active.pop(key)
+        sprite.visible = False
+        self.release(sprite)
+
+    def release_missing(self, seen):
+        for key in [key for key in self.active if key not in seen]:
+            self.release_key(key)
+
+    def release_all(self):
+        for key in list(self.active):
+            self.release_key(key)
@@ -0,0 +1,111 @@
+import atexit
+import csv
+import time
+from collections import deque
+
+import numpy as np
+
+PROFILE_FRAMES = 600
+
+
+class _PhaseTimer:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class FrameProfiler:
+    def __init__(self, capacity=PROFILE_FRAMES, enabled=True, csv_path=None):
+        self.frames = deque(maxlen=capacity)
+        self.enabled = enabled
+        self.current = None
+        self.frame_index = 0
+        self.phase_names = []
+        self.count_names = []
+        self.csv_path = csv_path
+        if csv_path:
+            atexit.register(self.dump_csv)
+
+    def begin_frame(self):
+        if not self.enabled:
+            self.current = None
+            return
+        if self.current is not None:
+            self.frames.append(self.current)
+        self.frame_index += 1
+        self.current = (self.frame_index, {}, {})
+
+    def end_frame(self):
+        if self.current is not None:
+            self.frames.append(self.current)
+            self.current = None
+
+    def phase(self, name):
+        if self.current is None:
+            return _NULL_TIMER
+        return _PhaseTimer(self, name)
+
+    def add(self, name, seconds):
+        if self.current is None:
+            return
+        phases = self.current[1]
+        if name not in phases and name not in self.phase_names:
+            self.phase_names.append(name)
+        phases[name] = phases.get(name, 0.0) + seconds
+
+    def count(self, name, value):
+        if self.current is None:
+            return
+        if name not in self.count_names:
+            self.count_names.append(name)
+        self.current[2][name] = value
+
+    def summary(self):
+        result = []
+        for name in self.phase_names:
+            samples = [phases[name] for _, phases, _ in self.frames if name in phases]
+            if samples:
+                p50, p99 = np.percentile(samples, [50, 99]) * 1000
+                result.append((name, float(p50), float(p99)))
+        return result
+
+    def latest_counts(self):
+        if not self.frames:
+            return {}
+        return self.frames[-1][2]
+
+    def dump_csv(self, path=None):
+        path = path or self.csv_path
+        if not path or not self.frames:
+            return
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + [f"{name}_ms" for name in self.phase_names] + self.count_names)
+            for index, phases, counts in self.frames:
+                writer.writerow([index] +
+                                [f"{phases.get(name, 0.0) * 1000:.4f}" for name in self.phase_names] +
+                                [counts.get(name, "") for name in self.count_names])
+
+
+NULL_PROFILER = FrameProfiler(capacity=1, enabled=False)
@@ -0,0 +1,71 @@
+from collections import deque
+
+# Бюджет кадра: при 60 кадрах в секунду на обновление и отрисовку есть 16.7 мс.
+FRAME_BUDGET = 1 / 60
+# Скользящее среднее берётся по стольким кадрам; решение принимается только по полному окну.
+QUALITY_WINDOW = 60
+# Снижать качество, когда среднее вышло за бюджет; повышать — когда запас большой и держится дольше.
+DOWNGRADE_RATIO = 1.0
+UPGRADE_RATIO = 0.6
+UPGRADE_HOLD_FRAMES = 180
+
+# particles — доля ёмкости системы частиц, effects — доля частиц в каждом эффекте,
+# ai_period_scale — во сколько раз реже думают дальние зомби, decals — оставлять ли следы на земле.
+QUALITY_LEVELS = (
+    {"name": "высокое", "particles": 1.0, "effects": 1.0, "ai_period_scale": 1, "decals": True},
+    {"name": "среднее", "particles": 0.5, "effects": 0.6, "ai_period_scale": 1, "decals": True},
+    {"name": "низкое", "particles": 0.25, "effects": 0.4, "ai_period_scale": 2, "decals": True},
+    {"name": "минимальное", "particles": 0.1, "effects": 0.2, "ai_period_scale": 4, "decals": False},
+)
+
+
+class QualityGovernor:
+    def __init__(self, budget=FRAME_BUDGET, window=QUALITY_WINDOW, levels=QUALITY_LEVELS, enabled=True):
+        self.budget = budget
+        self.levels = levels
+        self.enabled = enabled
+        self.samples = deque(maxlen=window)
+        self.total = 0.0
+        self.level = 0
+        self.headroom_frames = 0
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    @property
+    def average(self):
+        return self.total / len(self.samples) if self.samples else 0.0
+
+    def set_level(self, level):
+        level = max(0, min(int(level), len(self.levels) - 1))
+        changed = level != self.level
+        self.level = level
+        # После смены уровня старые замеры ничего не говорят о новой нагрузке.
+        self.samples.clear()
+        self.total = 0.0
+        self.headroom_frames = 0
+        return changed
+
+    def update(self, frame_time):
+        # Возвращает True, если уровень качества сменился.
+        if not self.enabled:
+            return False
+        samples = self.samples
+        if len(samples) == samples.maxlen:
+            self.total -= samples[0]
+        samples.append(frame_time)
+        self.total += frame_time
+        if len(samples) < samples.maxlen:
+            return False
+
+        average = self.average
+        if average > self.budget * DOWNGRADE_RATIO and self.level < len(self.levels) - 1:
+            return self.set_level(self.level + 1)
+        if average < self.budget * UPGRADE_RATIO and self.level > 0:
+            self.headroom_frames += 1
+            if self.headroom_frames >= UPGRADE_HOLD_FRAMES:
+                return self.set_level(self.level - 1)
+        else:
+            self.headroom_frames = 0
+        return False
@@ -0,0 +1,483 @@
+import arcade
+import numpy as np
+from arcade.gl import geometry
+from arcade.shape_list import ShapeElementList, create_rectangle_filled, create_rectangle_outline
+from pyglet import gl
+
+from simulation import BLOOD, SMOKE
+
+PARTICLE_COLORS = {
+    BLOOD: arcade.color.RED_DEVIL,
+    SMOKE: arcade.color.GRAY,
+}
+
+# Следы на земле: слой в DECAL_SCALE от размера мира, угасание на DECAL_FADE единиц альфы (из 255) в секунду.
+DECAL_SCALE = 0.5
+DECAL_FADE = 2
+DECAL_PARTICLE_ALPHA = 110
+DECAL_STAIN_ALPHA = 170
+DECAL_STAIN_SIZE = 34
+DECAL_STAIN_COLOR = (110, 0, 0)
+
+PARTICLE_VS = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+in vec2 in_pos;
+in float in_size;
+in vec4 in_color;
+
+out vec4 v_color;
+
+void main() {
+    gl_Position = window.projection * window.view * vec4(in_pos, 0.0, 1.0);
+    gl_PointSize = in_size;
+    v_color = in_color;
+}
+"""
+
+PARTICLE_FS = """
+#version 330
+
+in vec4 v_color;
+out vec4 f_color;
+
+void main() {
+    vec2 offset = gl_PointCoord - vec2(0.5);
+    if (dot(offset, offset) > 0.25) discard;
+    f_color = v_color;
+}
+"""
+
+
+# Отпечатки рисуются прямо в координатах слоя: мир целиком отображается в текстуру, камера не участвует.
+STAMP_VS = """
+#version 330
+
+uniform vec2 world_size;
+uniform float scale;
+
+in vec2 in_pos;
+in float in_size;
+in vec4 in_color;
+
+out vec4 v_color;
+
+void main() {
+    gl_Position = vec4(in_pos / world_size * 2.0 - 1.0, 0.0, 1.0);
+    gl_PointSize = max(in_size * scale, 1.0);
+    v_color = in_color;
+}
+"""
+
+STAMP_FS = """
+#version 330
+
+in vec4 v_color;
+out vec4 f_color;
+
+void main() {
+    vec2 offset = gl_PointCoord - vec2(0.5);
+    float d2 = dot(offset, offset);
+    if (d2 > 0.25) discard;
+    f_color = vec4(v_color.rgb, v_color.a * smoothstep(0.25, 0.1, d2));
+}
+"""
+
+LAYER_VS = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+in vec2 in_vert;
+in vec2 in_uv;
+
+out vec2 v_uv;
+
+void main() {
+    gl_Position = window.projection * window.view * vec4(in_vert, 0.0, 1.0);
+    v_uv = in_uv;
+}
+"""
+
+LAYER_FS = """
+#version 330
+
+uniform sampler2D layer;
+
+in vec2 v_uv;
+out vec4 f_color;
+
+void main() {
+    f_color = texture(layer, v_uv);
+}
+"""
+
+FADE_VS = """
+#version 330
+
+in vec2 in_vert;
+
+void main() {
+    gl_Position = vec4(in_vert, 0.0, 1.0);
+}
+"""
+
+FADE_FS = """
+#version 330
+
+uniform float amount;
+out vec4 f_color;
+
+void main() {
+    f_color = vec4(amount);
+}
+"""
+
+# Снимок кадра растягивается на весь экран, без камеры.
+FRAME_VS = """
+#version 330
+
+in vec2 in_vert;
+in vec2 in_uv;
+
+out vec2 v_uv;
+
+void main() {
+    gl_Position = vec4(in_vert, 0.0, 1.0);
+    v_uv = in_uv;
+}
+"""
+
+FRAME_FS = """
+#version 330
+
+uniform sampler2D frame;
+uniform float brightness;
+
+in vec2 v_uv;
+out vec4 f_color;
+
+void main() {
+    vec4 color = texture(frame, v_uv);
+    f_color = vec4(color.rgb * brightness, 1.0);
+}
+"""
+
+
+_programs = {}
+
+
+def particle_program(ctx):
+    # Шейдер собирается один раз на контекст; меню прогревает его заранее.
+    if ctx not in _programs:
+        _programs[ctx] = ctx.program(vertex_shader=PARTICLE_VS, fragment_shader=PARTICLE_FS)
+    return _programs[ctx]
+
+
+def warm_up(ctx, hint=""):
+    # Первая сборка шейдера и растеризация глифов HUD стоят десятки миллисекунд — делаем их заранее.
+    particle_program(ctx)
+    Hud(hint).hp_text.text = " 0123456789/"
+
+
+class ParticleRenderer:
+    def __init__(self, ctx, capacity):
+        self.ctx = ctx
+        self.capacity = capacity
+        self.program = particle_program(ctx)
+        self.buffer = ctx.buffer(reserve=capacity * 7 * 4)
+        self.geometry = ctx.geometry(
+            [arcade.gl.BufferDescription(self.buffer, "2f 1f 4f", ["in_pos", "in_size", "in_color"])],
+            mode=ctx.POINTS,
+        )
+        self.data = np.zeros((capacity, 7), dtype=np.float32)
+
+        colors = np.zeros((max(PARTICLE_COLORS) + 1, 3), dtype=np.float32)
+        for kind, color in PARTICLE_COLORS.items():
+            colors[kind] = [c / 255 for c in color[:3]]
+        self.colors = colors
+
+    def draw(self, particles, alpha=1.0, view=None):
+        n = min(particles.count, self.capacity)
+        if n == 0:
+            return
+        prev_x = particles.prev_x[:n]
+        prev_y = particles.prev_y[:n]
+        x = prev_x + (particles.x[:n] - prev_x) * alpha
+        y = prev_y + (particles.y[:n] - prev_y) * alpha
+        size = particles.size[:n]
+        kind = particles.kind[:n]
+        opacity = particles.alpha[:n]
+        if view is not None:
+            # Частицы за пределами экрана не попадают в буфер.
+            left, bottom, right, top = view
+            inside = np.flatnonzero((x + size >= left) & (x - size <= right) & (y + size >= bottom) & (y - size <= top))
+            x, y, size, kind, opacity = x[inside], y[inside], size[inside], kind[inside], opacity[inside]
+            n = len(inside)
+            if n == 0:
+                return
+
+        data = self.data[:n]
+        data[:, 0] = x
+        data[:, 1] = y
+        data[:, 2] = size
+        data[:, 3:6] = self.colors[kind]
+        np.clip(opacity / 255, 0, 1, out=data[:, 6])
+
+        self.buffer.orphan()
+        self.buffer.write(data.tobytes())
+        with self.ctx.enabled(self.ctx.BLEND, gl.GL_PROGRAM_POINT_SIZE):
+            self.geometry.render(self.program, vertices=n)
+
+
+class DecalLayer:
+    # Следы крови запекаются в текстуру размером с мир и рисуются одним прямоугольником:
+    # цена кадра не зависит от того, сколько зомби уже убито.
+    def __init__(self, ctx, width, height, scale=DECAL_SCALE, fade_rate=DECAL_FADE):
+        self.ctx = ctx
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.fade_rate = fade_rate
+        self.fade_debt = 0.0
+        self.texture = ctx.texture((max(1, int(width * scale)), max(1, int(height * scale))), components=4)
+        self.framebuffer = ctx.framebuffer(color_attachments=[self.texture])
+        self.stamp_program = ctx.program(vertex_shader=STAMP_VS, fragment_shader=STAMP_FS)
+        self.stamp_program["world_size"] = (width, height)
+        self.stamp_program["scale"] = scale
+        self.layer_program = ctx.program(vertex_shader=LAYER_VS, fragment_shader=LAYER_FS)
+        self.fade_program = ctx.program(vertex_shader=FADE_VS, fragment_shader=FADE_FS)
+        self.quad = geometry.quad_2d((width, height), (width / 2, height / 2))
+        self.fullscreen = geometry.quad_2d_fs()
+        self.capacity = 0
+        self.buffer = None
+        self.geometry = None
+        self.pending = []
+        self.clear()
+
+    def clear(self):
+        self.pending = []
+        self.fade_debt = 0.0
+        self.framebuffer.clear()
+
+    def stamp(self, x, y, size, color, alpha):
+        # Отпечатки копятся до flush и уходят в слой одним вызовом отрисовки.
+        x = np.atleast_1d(np.asarray(x, dtype=np.float32))
+        if not len(x):
+            return
+        data = np.empty((len(x), 7), dtype=np.float32)
+        data[:, 0] = x
+        data[:, 1] = y
+        data[:, 2] = size
+        data[:, 3:6] = np.asarray(color, dtype=np.float32)[..., :3] / 255
+        data[:, 6] = alpha / 255
+        self.pending.append(data)
+
+    def stamp_particles(self, kind, x, y, size):
+        # Дым рассеивается бесследно, на земле остаётся только кровь.
+        blood = kind == BLOOD
+        if np.any(blood):
+            self.stamp(x[blood], y[blood], size[blood], PARTICLE_COLORS[BLOOD], DECAL_PARTICLE_ALPHA)
+
+    def stamp_stain(self, x, y):
+        self.stamp(x, y, DECAL_STAIN_SIZE, DECAL_STAIN_COLOR, DECAL_STAIN_ALPHA)
+
+    def _reserve(self, count):
+        if count <= self.capacity:
+            return
+        self.capacity = max(count, self.capacity * 2, 256)
+        self.buffer = self.ctx.buffer(reserve=self.capacity * 7 * 4)
+        self.geometry = self.ctx.geometry(
+            [arcade.gl.BufferDescription(self.buffer, "2f 1f 4f", ["in_pos", "in_size", "in_color"])],
+            mode=self.ctx.POINTS,
+        )
+
+    def flush(self):
+        if not self.pending:
+            return
+        data = np.concatenate(self.pending)
+        self.pending = []
+        self._reserve(len(data))
+        self.buffer.orphan()
+        self.buffer.write(data.tobytes())
+        ctx = self.ctx
+        # В слое хранится цвет, уже умноженный на альфу: так следы правильно ложатся друг на друга и угасают.
+        with self.framebuffer.activate(), ctx.enabled(ctx.BLEND, gl.GL_PROGRAM_POINT_SIZE):
+            ctx.blend_func = ctx.SRC_ALPHA, ctx.ONE_MINUS_SRC_ALPHA, ctx.ONE, ctx.ONE_MINUS_SRC_ALPHA
+            self.geometry.render(self.stamp_program, vertices=len(data))
+        ctx.blend_func = ctx.BLEND_DEFAULT
+
+    def fade(self, elapsed):
+        # Из слоя вычитаются целые единицы альфы: дробные шаги потерялись бы при округлении в 8 бит.
+        self.fade_debt += self.fade_rate * elapsed
+        steps = int(self.fade_debt)
+        if steps <= 0:
+            return
+        self.fade_debt -= steps
+        ctx = self.ctx
+        self.fade_program["amount"] = steps / 255
+        with self.framebuffer.activate(), ctx.enabled(ctx.BLEND):
+            ctx.blend_func = ctx.ONE, ctx.ONE
+            gl.glBlendEquation(gl.GL_FUNC_REVERSE_SUBTRACT)
+            self.fullscreen.render(self.fade_program)
+            gl.glBlendEquation(gl.GL_FUNC_ADD)
+        ctx.blend_func = ctx.BLEND_DEFAULT
+
+    def draw(self):
+        ctx = self.ctx
+        self.texture.use(0)
+        with ctx.enabled(ctx.BLEND):
+            ctx.blend_func = ctx.ONE, ctx.ONE_MINUS_SRC_ALPHA
+            self.quad.render(self.layer_program)
+        ctx.blend_func = ctx.BLEND_DEFAULT
+
+
+class FrozenFrame:
+    # Кадр игры, снятый один раз: пауза и экран поражения рисуют его вместо всей сцены.
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.texture = None
+        self.framebuffer = None
+        self.program = ctx.program(vertex_shader=FRAME_VS, fragment_shader=FRAME_FS)
+        self.quad = geometry.quad_2d_fs()
+
+    def capture(self, draw, background=(0, 0, 0, 255)):
+        # Сцена рисуется сразу в свою текстуру; её собственная очистка экрана сюда не попадает.
+        ctx = self.ctx
+        size = ctx.screen.size
+        if self.texture is None or self.texture.size != size:
+            self.texture = ctx.texture(size, components=4)
+            self.framebuffer = ctx.framebuffer(color_attachments=[self.texture])
+        self.framebuffer.clear(color=background)
+        with self.framebuffer.activate():
+            draw()
+
+    def draw(self, brightness=1.0):
+        if self.texture is None:
+            return
+        self.texture.use(0)
+        self.program["brightness"] = brightness
+        self.quad.render(self.program)
+
+
+class Hud:
+    BAR_X = 20
+    BAR_TOP = 40
+    BAR_WIDTH = 200
+    BAR_HEIGHT = 20
+    HIT_FLASH_COLOR = (255, 0, 0, 50)
+
+    def __init__(self, hint="", hint_margin=20, hint_y=30):
+        # Геометрия и тексты HUD живут между кадрами и пересобираются только при смене HP или размера окна.
+        self.hint_margin = hint_margin
+        self.hp_text = arcade.Text("", self.BAR_X + 5, 0, arcade.color.WHITE, 12, bold=True)
+        self.hint_text = arcade.Text(hint, 0, hint_y, arcade.color.WHITE, 14, anchor_x="right")
+        self.weapon_text = arcade.Text("", self.BAR_X, 0, arcade.color.WHITE, 12)
+        self.bar = None
+        self.flash = None
+        self.bar_key = None
+        self.size = None
+
+    def set_weapon(self, text):
+        if self.weapon_text.text != text:
+            self.weapon_text.text = text
+
+    def _health_color(self, hp, max_hp):
+        if hp < max_hp * 0.3:
+            return arcade.color.RED
+        if hp < max_hp * 0.6:
+            return arcade.color.ORANGE
+        return arcade.color.GREEN
+
+    def _rebuild_bar(self, hp, max_hp, height):
+        left = self.BAR_X
+        bottom = height - self.BAR_TOP
+        width = self.BAR_WIDTH
+        bar_height = self.BAR_HEIGHT
+        health_width = max(0, hp / max_hp * width)
+
+        bar = ShapeElementList()
+        bar.append(create_rectangle_filled(left + width / 2, bottom + bar_height / 2, width, bar_height,
+                                           arcade.color.GRAY))
+        if health_width > 0:
+            bar.append(create_rectangle_filled(left + health_width / 2, bottom + bar_height / 2, health_width,
+                                               bar_height, self._health_color(hp, max_hp)))
+        bar.append(create_rectangle_outline(left + width / 2, bottom + bar_height / 2, width, bar_height,
+                                            arcade.color.WHITE, 2))
+        self.bar = bar
+        self.hp_text.text = f" {int(hp)}/{max_hp}"
+        self.hp_text.y = bottom + 2
+
+    def _resize(self, width, height):
+        self.flash = ShapeElementList()
+        self.flash.append(create_rectangle_filled(width / 2, height / 2, width, height, self.HIT_FLASH_COLOR))
+        self.hint_text.x = width - self.hint_margin
+        self.weapon_text.y = height - self.BAR_TOP - 22
+        self.size = (width, height)
+
+    def draw(self, hp, max_hp, width, height, flash=False):
+        if self.size != (width, height):
+            self._resize(width, height)
+            self.bar_key = None
+        if self.bar_key != (hp, max_hp):
+            self._rebuild_bar(hp, max_hp, height)
+            self.bar_key = (hp, max_hp)
+
+        self.bar.draw()
+        self.hp_text.draw()
+        self.weapon_text.draw()
+        self.hint_text.draw()
+        if flash:
+            self.flash.draw()
+
+
+class ProfilerOverlay:
+    REFRESH_FRAMES = 30
+
+    def __init__(self, profiler, x=10, top=10, font_size=11):
+        self.profiler = profiler
+        self.x = x
+        self.top = top
+        self.font_size = font_size
+        self.visible = False
+        self.frames_until_refresh = 0
+        self.lines = []
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.frames_until_refresh = 0
+
+    def _refresh(self, window_height):
+        rows = [f"{'фаза':<10}{'p50 мс':>9}{'p99 мс':>9}"]
+        for name, p50, p99 in self.profiler.summary():
+            rows.append(f"{name:<10}{p50:>9.3f}{p99:>9.3f}")
+        counts = self.profiler.latest_counts()
+        if counts:
+            rows.append("  ".join(f"{name}: {value}" for name, value in counts.items()))
+
+        line_height = self.font_size + 6
+        while len(self.lines) < len(rows):
+            self.lines.append(arcade.Text("", self.x, 0, arcade.color.YELLOW, self.font_size,
+                                          font_name=("Consolas", "Courier New", "monospace")))
+        del self.lines[len(rows):]
+        for i, (line, row) in enumerate(zip(self.lines, rows)):
+            line.text = row
+            line.y = window_height - self.top - (i + 1) * line_height
+
+    def draw(self, window_height):
+        if not self.visible:
+            return
+        if self.frames_until_refresh <= 0:
+            self._refresh(window_height)
+            self.frames_until_refresh = self.REFRESH_FRAMES
+        self.frames_until_refresh -= 1
+        for line in self.lines:
+            line.draw()
@@ -0,0 +1,152 @@
+import argparse
+import json
+import time
+
+from simulation import PlayerInput, Simulation
+
+REPLAY_VERSION = 1
+
+
+def apply_event(inp, event):
+    kind = event[0]
+    if kind == "key":
+        setattr(inp, event[1], event[2])
+    elif kind == "aim":
+        inp.aim_x, inp.aim_y = event[1], event[2]
+    elif kind == "fire":
+        inp.aim_x, inp.aim_y = event[1], event[2]
+        inp.fire = True
+    elif kind == "weapon":
+        inp.weapon = event[1]
+    elif kind == "medkit":
+        inp.use_medkit = True
+    elif kind == "ai_period":
+        inp.ai_period_scale = event[1]
+    elif kind == "reset":
+        inp.reset_movement()
+        inp.fire = False
+
+
+class InputRecorder:
+    def __init__(self, seed, width, height, params=None, view_size=None):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.params = params
+        self.view_size = view_size
+        self.events = []
+        self.last_aim = None
+
+    def record(self, tick, event):
+        # Движение мыши между тиками схлопывается: на симуляцию влияет только последняя позиция.
+        if event[0] == "aim" and self.last_aim == (tick, len(self.events) - 1):
+            self.events[self.last_aim[1]] = [tick] + list(event)
+            return
+        if event[0] == "aim":
+            self.last_aim = (tick, len(self.events))
+        self.events.append([tick] + list(event))
+
+    def to_dict(self, sim=None):
+        data = {
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "width": self.width,
+            "height": self.height,
+            "params": self.params,
+            "view": list(self.view_size) if self.view_size is not None else None,
+            "events": self.events,
+        }
+        if sim is not None:
+            data["final"] = {"tick": sim.tick, "kills": sim.kills, "hp": sim.hp}
+        return data
+
+    def save(self, path, sim=None):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(sim), f, separators=(",", ":"))
+
+
+class Replay:
+    def __init__(self, data):
+        if data.get("version") != REPLAY_VERSION:
+            raise ValueError(f"Неподдерживаемая версия записи: {data.get('version')}")
+        self.seed = data["seed"]
+        self.width = data["width"]
+        self.height = data["height"]
+        self.params = data.get("params")
+        self.view_size = data.get("view")
+        self.events = [(event[0], tuple(event[1:])) for event in data["events"]]
+        self.final = data.get("final")
+        self.position = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def length(self):
+        if self.final:
+            return self.final["tick"]
+        return self.events[-1][0] + 1 if self.events else 0
+
+    def rewind(self):
+        self.position = 0
+
+    def apply(self, tick, inp):
+        events = self.events
+        while self.position < len(events) and events[self.position][0] <= tick:
+            apply_event(inp, events[self.position][1])
+            self.position += 1
+
+    def make_simulation(self):
+        return Simulation(self.width, self.height, seed=self.seed, params=self.params, view_size=self.view_size)
+
+
+def run_headless(replay, ticks=None):
+    replay.rewind()
+    sim = replay.make_simulation()
+    inp = PlayerInput()
+    ticks = replay.length if ticks is None else ticks
+    while sim.tick < ticks and not sim.game_over:
+        replay.apply(sim.tick, inp)
+        sim.step(inp)
+        inp.clear_actions()
+    return sim
+
+
+def run_rendered(replay):
+    import arcade
+    import views
+
+    width, height = replay.view_size or (replay.width, replay.height)
+    window = arcade.Window(width, height, "Z ATTACK — повтор", update_rate=1 / 1000, draw_rate=1 / 1000)
+    views.show(window, "game", replay=replay)
+    arcade.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанной сессии Z ATTACK")
+    parser.add_argument("path")
+    parser.add_argument("--render", action="store_true", help="показывать игру в окне")
+    parser.add_argument("--ticks", type=int, default=None, help="сколько тиков проиграть")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    if args.render:
+        run_rendered(replay)
+        return
+
+    start = time.perf_counter()
+    sim = run_headless(replay, args.ticks)
+    elapsed = time.perf_counter() - start
+    print(f"Тиков: {sim.tick}, убито: {sim.kills}, HP: {sim.hp}, "
+          f"{sim.tick / elapsed if elapsed else 0:.0f} тиков/с")
+    if replay.final and args.ticks is None:
+        expected = replay.final
+        actual = {"tick": sim.tick, "kills": sim.kills, "hp": sim.hp}
+        if actual != expected:
+            print(f"Расхождение с записью: ожидалось {expected}, получено {actual}")
+
+
+if __name__ == "__main__":
+    main()
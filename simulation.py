@@ -0,0 +1,717 @@
+import math
+import random
+
+import numpy as np
+
+from horde import Horde
+from items import Inventory, ItemStore
+from navigation import Navigator
+from particles import MAX_PARTICLES, ParticleSystem
+from pools import ObjectPool
+from profiler import NULL_PROFILER
+from spatial import SpatialGrid, segment_entry
+
+# Скорости в пикселях в секунду, задержки и таймеры в секундах.
+PLAYER_SPEED = 300
+ZOMBIE_SPEED = 120
+SPAWN_RATE = 1.5
+
+PLAYER_MAX_HP = 100
+ZOMBIE_DAMAGE = 20
+HIT_DELAY = 1.0
+
+BULLET_SPEED = 720
+ZOMBIE_MAX_HP = 2
+
+SHOOT_DELAY = 0.15
+
+BASE_STOP_DISTANCE = 55
+SPAWN_OFFSET = 50
+BULLET_SPAWN_DIST = 60
+
+# Расталкивание зомби в толпе: радиус в пикселях и максимальная скорость отталкивания в пикселях в секунду.
+SEPARATION_RADIUS = 24
+SEPARATION_STRENGTH = 90
+
+# Оружие. mode: projectile — летящая пуля, hitscan — мгновенный луч. pellets — дробин за выстрел, spread — угол
+# разлёта в градусах, range — дальность луча. delay None — задержка берётся из параметра shoot_delay.
+# max_ammo — сколько патронов помещается (None — бесконечные), pickup — сколько даёт подобранный предмет.
+WEAPONS = {
+    "pistol": {"mode": "projectile", "pellets": 1, "spread": 0, "damage": 1, "delay": None, "range": 0,
+               "max_ammo": None, "pickup": 0},
+    "shotgun": {"mode": "hitscan", "pellets": 8, "spread": 24, "damage": 1, "delay": 0.8, "range": 420,
+                "max_ammo": 24, "pickup": 6},
+    "rifle": {"mode": "hitscan", "pellets": 1, "spread": 0, "damage": 2, "delay": 0.4, "range": 1400,
+              "max_ammo": 30, "pickup": 10},
+}
+DEFAULT_WEAPON = "pistol"
+
+# Предметы, которые выпадают с убитых зомби: вид и его вес при выборе. Оружие — по имени из WEAPONS.
+ITEM_KINDS = ("ammo", "medkit", "shotgun", "rifle")
+ITEM_WEIGHTS = (6, 3, 1, 1)
+LOOT_CHANCE = 0.25
+ITEM_LIFETIME = 30
+ITEM_SIZE = (14, 14)
+PICKUP_RADIUS = 24
+MAGNET_RADIUS = 120
+MAGNET_SPEED = 420
+MEDKIT_HEAL = 30
+MAX_MEDKITS = 3
+
+# Уровни детализации ИИ: до какого расстояния до ближайшей цели (px) зомби думает раз в сколько тиков.
+AI_LOD = ((480, 1), (960, 4), (float("inf"), 8))
+# Сколько зомби максимум пересчитывают направление за тик.
+AI_BUDGET = 512
+
+# Параметры баланса, которые можно переопределить для отдельной симуляции (см. Simulation(params=...)).
+DEFAULT_PARAMS = {
+    "player_speed": PLAYER_SPEED,
+    "zombie_speed": ZOMBIE_SPEED,
+    "spawn_rate": SPAWN_RATE,
+    "player_max_hp": PLAYER_MAX_HP,
+    "zombie_damage": ZOMBIE_DAMAGE,
+    "hit_delay": HIT_DELAY,
+    "bullet_speed": BULLET_SPEED,
+    "zombie_max_hp": ZOMBIE_MAX_HP,
+    "shoot_delay": SHOOT_DELAY,
+    "separation_radius": SEPARATION_RADIUS,
+    "separation_strength": SEPARATION_STRENGTH,
+    "ai_budget": AI_BUDGET,
+    "loot_chance": LOOT_CHANCE,
+    "magnet_radius": MAGNET_RADIUS,
+}
+
+TICK_RATE = 60
+MAX_CATCHUP_STEPS = 5
+
+# Размеры хитбоксов повторяют размеры спрайтов из assets с их масштабом.
+PLAYER_SIZE = (19.5, 24)
+ZOMBIE_SIZE = (26, 32)
+BASE_SIZE = (89.4, 144)
+BULLET_SIZE = (2, 1)
+
+BLOOD_SIZE = (4, 10)
+SMOKE_SIZE = (5, 12)
+BLOOD_SPEED = 120
+BLOOD_EXPLOSION_SPEED = 240
+BLOOD_SPIN = 300
+BLOOD_FADE = 600
+SMOKE_SPEED = 120
+SMOKE_FADE = 900
+
+BLOOD = 0
+SMOKE = 1
+
+
+class PlayerInput:
+    def __init__(self):
+        self.up = False
+        self.down = False
+        self.left = False
+        self.right = False
+        self.aim_x = 0
+        self.aim_y = 0
+        self.fire = False
+        self.weapon = None
+        self.use_medkit = False
+        self.ai_period_scale = None
+
+    def reset_movement(self):
+        self.up = False
+        self.down = False
+        self.left = False
+        self.right = False
+
+    def clear_actions(self):
+        # Выстрел, смена оружия и аптечка — разовые действия, они действуют один тик.
+        self.fire = False
+        self.weapon = None
+        self.use_medkit = False
+        self.ai_period_scale = None
+
+
+class TickScheduler:
+    def __init__(self, dt=1 / TICK_RATE, max_steps=MAX_CATCHUP_STEPS):
+        self.dt = dt
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped_time = 0.0
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
+
+    def advance(self, elapsed):
+        self.accumulator += elapsed
+        steps = min(int(self.accumulator // self.dt), self.max_steps)
+        self.accumulator -= steps * self.dt
+        if self.accumulator >= self.dt:
+            # Не успеваем даже с догоняющими шагами: отбрасываем долг, чтобы не уйти в спираль.
+            excess = self.accumulator - self.accumulator % self.dt
+            self.dropped_time += excess
+            self.accumulator -= excess
+        return steps
+
+    def reset(self):
+        self.accumulator = 0.0
+
+
+class Body:
+    def __init__(self, x, y, size):
+        self.x = x
+        self.y = y
+        self.width, self.height = size
+        self.prev_x = x
+        self.prev_y = y
+        self.change_x = 0
+        self.change_y = 0
+        self.angle = 0
+
+    def store_previous(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    @property
+    def left(self):
+        return self.x - self.width / 2
+
+    @property
+    def right(self):
+        return self.x + self.width / 2
+
+    @property
+    def bottom(self):
+        return self.y - self.height / 2
+
+    @property
+    def top(self):
+        return self.y + self.height / 2
+
+    def overlaps(self, other):
+        return (abs(self.x - other.x) * 2 < self.width + other.width and
+                abs(self.y - other.y) * 2 < self.height + other.height)
+
+
+class Player:
+    # Состояние одного игрока. В одиночной игре он один, в кооперативе — по игроку на участника.
+    def __init__(self, x, y, max_hp):
+        self.body = Body(x, y, PLAYER_SIZE)
+        self.hp = max_hp
+        self.last_hit_time = float("-inf")
+        self.can_shoot_timer = 0.0
+        self.aim_angle = 0.0
+        self.weapon = DEFAULT_WEAPON
+        self.inventory = Inventory([DEFAULT_WEAPON])
+
+    @property
+    def alive(self):
+        return self.hp > 0
+
+
+def _first_player(name):
+    # Одиночная игра обращается к состоянию своего игрока прямо через симуляцию: sim.hp, sim.weapon и т.д.
+    return property(lambda self: getattr(self.players[0], name),
+                    lambda self, value: setattr(self.players[0], name, value))
+
+
+# Где появляются игроки относительно центра базы: первый слева, остальные по кругу.
+PLAYER_SPAWNS = ((-100, 0), (100, 0), (0, -120), (0, 120))
+
+
+class Simulation:
+    player = property(lambda self: self.players[0].body)
+    hp = _first_player("hp")
+    last_hit_time = _first_player("last_hit_time")
+    can_shoot_timer = _first_player("can_shoot_timer")
+    aim_angle = _first_player("aim_angle")
+    weapon = _first_player("weapon")
+    inventory = _first_player("inventory")
+
+    def __init__(self, width, height, seed=None, dt=1 / TICK_RATE, max_particles=MAX_PARTICLES, params=None,
+                 view_size=None):
+        params = dict(params or {})
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры симуляции: {', '.join(sorted(unknown))}")
+        self.params = {**DEFAULT_PARAMS, **params}
+        for name, value in self.params.items():
+            setattr(self, name, value)
+
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.fx_rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        # Размер видимой области: в мире больше экрана зомби появляются сразу за её краем, а не у краёв мира.
+        self.view_size = tuple(view_size) if view_size is not None else None
+        self.dt = dt
+
+        self.tick = 0
+        self.time = 0.0
+        self.time_since_last_spawn = 0.0
+
+        self.game_over = False
+        self.kills = 0
+
+        cx = width // 2
+        cy = height // 2
+        self.base = Body(cx, cy, BASE_SIZE)
+        self.walls = [self.base]
+        self.players = []
+        self.add_player()
+
+        self.zombies = Horde()
+        self.zombie_grid = SpatialGrid(max(ZOMBIE_SIZE))
+        self.zombie_grid_version = None
+        self.navigator = Navigator(width, height, SPAWN_OFFSET + max(ZOMBIE_SIZE), max(ZOMBIE_SIZE) / 2)
+        self.navigator.set_walls(self.walls, self.base)
+        self.items = ItemStore(PICKUP_RADIUS)
+        self.shots = []
+        self.bullets = []
+        self.bullet_pool = ObjectPool(lambda: Body(0, 0, BULLET_SIZE), prealloc=32)
+        self.particles = ParticleSystem(max_particles)
+        # Доля частиц в эффектах крови и дыма: чисто визуальная настройка, на игру не влияет.
+        self.effects_scale = 1.0
+        self.set_ai_period_scale(1)
+        self.events = []
+        self.profiler = NULL_PROFILER
+
+    def add_player(self):
+        offset_x, offset_y = PLAYER_SPAWNS[len(self.players) % len(PLAYER_SPAWNS)]
+        self.players.append(Player(self.base.x + offset_x, self.base.y + offset_y, self.player_max_hp))
+        return len(self.players) - 1
+
+    def step(self, inp):
+        self.events = []
+        if self.game_over:
+            return
+        profiler = self.profiler
+        # В кооперативе inp — список вводов по игрокам; игрок без ввода (None) стоит на месте.
+        inputs = list(inp) if isinstance(inp, (list, tuple)) else [inp]
+        controls = [(player, inputs[i] if i < len(inputs) else None)
+                    for i, player in enumerate(self.players) if player.alive]
+        # Частота ИИ меняет ход игры, поэтому приходит вместе с вводом и попадает в запись.
+        if inputs and inputs[0] is not None and inputs[0].ai_period_scale is not None:
+            self.set_ai_period_scale(inputs[0].ai_period_scale)
+
+        with profiler.phase("player"):
+            for player, control in controls:
+                if control is None:
+                    continue
+                if control.weapon is not None:
+                    self.select_weapon(control.weapon, player)
+                if control.use_medkit:
+                    self.use_medkit(player)
+                if control.fire and player.can_shoot_timer >= self.weapon_delay(player):
+                    self.fire(control.aim_x, control.aim_y, player)
+
+            self.tick += 1
+            self.time += self.dt
+
+            for player, control in controls:
+                player.can_shoot_timer += self.dt
+                self.move_player(control, player)
+                if control is not None:
+                    dx = control.aim_x - player.body.x
+                    dy = control.aim_y - player.body.y
+                    player.aim_angle = math.degrees(math.atan2(dy, dx))
+
+            self.time_since_last_spawn += self.dt
+            if self.time_since_last_spawn > self.spawn_rate:
+                self.spawn_enemy()
+                self.time_since_last_spawn = 0
+
+        with profiler.phase("ai"):
+            self.update_enemies_ai()
+        with profiler.phase("crowd"):
+            self.separate_crowd()
+        with profiler.phase("ai"):
+            self.zombies.move(self.dt)
+
+        with profiler.phase("grid"):
+            self.rebuild_zombie_grid()
+
+        # Убитые зомби только помечаются (hp <= 0), чтобы индексы в сетке оставались верными до конца тика.
+        with profiler.phase("bullets"):
+            self.resolve_shots()
+            self.update_bullets()
+        with profiler.phase("contact"):
+            self.check_player_hits()
+            self.zombies.remove_dead()
+        with profiler.phase("items"):
+            self.update_items()
+
+        with profiler.phase("particles"):
+            self.particles.update(self.dt)
+        self.clamp_players()
+
+    def set_ai_period_scale(self, scale):
+        # Ближний уровень ИИ не трогается: реже думают только дальние зомби.
+        self.ai_period_scale = scale
+        self.ai_lod = AI_LOD[:1] + tuple((limit, period * scale) for limit, period in AI_LOD[1:])
+
+    def alive_players(self):
+        return [player for player in self.players if player.alive]
+
+    def weapon_delay(self, player=None):
+        player = player or self.players[0]
+        delay = WEAPONS[player.weapon]["delay"]
+        return self.shoot_delay if delay is None else delay
+
+    def select_weapon(self, name, player=None):
+        # Выбрать можно только оружие из инвентаря и с патронами.
+        player = player or self.players[0]
+        inventory = player.inventory
+        if name not in WEAPONS or not inventory.has_weapon(name):
+            return False
+        if WEAPONS[name]["max_ammo"] is not None and not inventory.count(name):
+            return False
+        player.weapon = name
+        return True
+
+    def fire(self, target_x, target_y, player=None):
+        player = player or self.players[0]
+        player.can_shoot_timer = 0
+        weapon = WEAPONS[player.weapon]
+        if weapon["max_ammo"] is not None:
+            player.inventory.take(player.weapon)
+            if not player.inventory.count(player.weapon):
+                # Последний патрон: следующий выстрел уже из оружия по умолчанию.
+                player.weapon = DEFAULT_WEAPON
+        px, py = player.body.x, player.body.y
+        aim = math.atan2(target_y - py, target_x - px)
+        spread = math.radians(weapon["spread"])
+        pellets = weapon["pellets"]
+
+        # Дробь ложится веером равномерно, без случайности: выстрел не сдвигает игровой генератор.
+        for i in range(pellets):
+            angle_rad = aim + (spread * (i / (pellets - 1) - 0.5) if pellets > 1 else 0.0)
+            x = px + math.cos(angle_rad) * BULLET_SPAWN_DIST
+            y = py + math.sin(angle_rad) * BULLET_SPAWN_DIST
+            if weapon["mode"] == "hitscan":
+                # Лучи считаются в фазе пуль, когда сетка зомби уже перестроена под текущие позиции.
+                self.shots.append((x, y, angle_rad, weapon["range"], weapon["damage"]))
+                continue
+
+            bullet = self.bullet_pool.acquire()
+            bullet.x = x
+            bullet.y = y
+            bullet.store_previous()
+            bullet.angle = math.degrees(angle_rad)
+            bullet.change_x = math.cos(angle_rad) * self.bullet_speed
+            bullet.change_y = math.sin(angle_rad) * self.bullet_speed
+            self.bullets.append(bullet)
+        self.create_muzzle_flash(px + math.cos(aim) * BULLET_SPAWN_DIST, py + math.sin(aim) * BULLET_SPAWN_DIST,
+                                 math.degrees(aim))
+
+    def move_player(self, inp, player=None):
+        player = (player or self.players[0]).body
+        player.store_previous()
+        player.change_x = 0
+        player.change_y = 0
+        if inp is None:
+            return
+
+        speed = self.player_speed
+        if inp.up: player.change_y = speed
+        if inp.down: player.change_y = -speed
+        if inp.left: player.change_x = -speed
+        if inp.right: player.change_x = speed
+
+        # Как в arcade.PhysicsEngineSimple: сначала ось X, потом Y, с выталкиванием из стен.
+        player.x += player.change_x * self.dt
+        for wall in self.walls:
+            if player.overlaps(wall):
+                if player.change_x > 0:
+                    player.x = wall.left - player.width / 2
+                elif player.change_x < 0:
+                    player.x = wall.right + player.width / 2
+
+        player.y += player.change_y * self.dt
+        for wall in self.walls:
+            if player.overlaps(wall):
+                if player.change_y > 0:
+                    player.y = wall.bottom - player.height / 2
+                elif player.change_y < 0:
+                    player.y = wall.top + player.height / 2
+
+    def clamp_players(self):
+        for player in self.players:
+            player = player.body
+            if player.left < 0: player.x = player.width / 2
+            if player.right > self.width: player.x = self.width - player.width / 2
+            if player.bottom < 0: player.y = player.height / 2
+            if player.top > self.height: player.y = self.height - player.height / 2
+
+    def spawn_area(self):
+        if self.view_size is None:
+            return 0, 0, self.width, self.height
+        w = min(int(self.view_size[0]), self.width)
+        h = min(int(self.view_size[1]), self.height)
+        # В кооперативе волна подходит к случайному живому игроку.
+        alive = self.alive_players() or self.players
+        player = alive[self.rng.randrange(len(alive))].body if len(alive) > 1 else alive[0].body
+        left = min(max(player.x - w / 2, 0), self.width - w)
+        bottom = min(max(player.y - h / 2, 0), self.height - h)
+        return left, bottom, w, h
+
+    def spawn_enemy(self):
+        rng = self.rng
+        side = rng.randint(0, 3)
+        left, bottom, w, h = self.spawn_area()
+
+        if side == 0:
+            x, y = left + rng.randint(0, w), bottom + h + SPAWN_OFFSET
+        elif side == 1:
+            x, y = left + w + SPAWN_OFFSET, bottom + rng.randint(0, h)
+        elif side == 2:
+            x, y = left + rng.randint(0, w), bottom - SPAWN_OFFSET
+        else:
+            x, y = left - SPAWN_OFFSET, bottom + rng.randint(0, h)
+
+        return self.zombies.add(x, y, self.zombie_max_hp)
+
+    def player_targets(self):
+        # Цель каждого зомби — ближайший живой игрок. С одним игроком это просто его координаты.
+        alive = self.alive_players()
+        if len(alive) == 1:
+            body = alive[0].body
+            return body.x, body.y, body.x, body.y
+        xs = np.array([player.body.x for player in alive])
+        ys = np.array([player.body.y for player in alive])
+        n = self.zombies.count
+        d2 = (self.zombies.x[:n, None] - xs) ** 2 + (self.zombies.y[:n, None] - ys) ** 2
+        nearest = np.argmin(d2, axis=1) if n else np.zeros(0, dtype=np.int64)
+        return xs[nearest], ys[nearest], xs, ys
+
+    def update_enemies_ai(self):
+        if not self.alive_players():
+            return
+        base = self.base
+        target_x, target_y, all_x, all_y = self.player_targets()
+        self.navigator.update(all_x, all_y)
+        thinkers = self.zombies.thinkers(self.tick, target_x, target_y, base.x, base.y, self.ai_lod, self.ai_budget)
+        self.profiler.count("ai_thinkers", len(thinkers))
+        if not np.isscalar(target_x):
+            target_x, target_y = target_x[thinkers], target_y[thinkers]
+        self.zombies.steer(target_x, target_y, base.x, base.y, self.zombie_speed, BASE_STOP_DISTANCE,
+                           navigator=self.navigator, indices=thinkers, tick=self.tick)
+
+    def separate_crowd(self):
+        if self.separation_strength <= 0:
+            return
+        # Отталкивание меняет скорость до движения, поэтому ему нужна сетка по текущим позициям. Сетка с конца
+        # прошлого тика годится, если с тех пор никто не погиб и не появился; иначе индексы в ней уже чужие.
+        self.rebuild_zombie_grid()
+        self.zombies.separate(self.zombie_grid, self.separation_radius, self.separation_strength)
+
+    def rebuild_zombie_grid(self):
+        zombies = self.zombies
+        if self.zombie_grid_version == zombies.version:
+            return
+        n = zombies.count
+        self.zombie_grid.rebuild(zombies.x[:n], zombies.y[:n])
+        self.zombie_grid_version = zombies.version
+
+    def zombies_touching(self, body):
+        zombie_width, zombie_height = ZOMBIE_SIZE
+        candidates = self.zombie_grid.query(body.left - zombie_width / 2, body.bottom - zombie_height / 2,
+                                            body.right + zombie_width / 2, body.top + zombie_height / 2)
+        if not len(candidates):
+            return candidates
+        return self.zombies.overlapping(candidates, body.x, body.y, body.width, body.height,
+                                        zombie_width, zombie_height)
+
+    def update_bullets(self):
+        alive = []
+        for bullet in self.bullets:
+            if self.update_bullet(bullet):
+                alive.append(bullet)
+            else:
+                self.bullet_pool.release(bullet)
+        self.bullets = alive
+
+    def cast(self, x0, y0, x1, y1, pad_x=0.0, pad_y=0.0):
+        # Первое препятствие на отрезке: (t, индекс зомби или None, задета ли стена).
+        # pad_x/pad_y расширяют коробки на половину размера снаряда.
+        t_wall = min((float(segment_entry(x0, y0, x1, y1, wall.left - pad_x, wall.bottom - pad_y,
+                                          wall.right + pad_x, wall.top + pad_y)) for wall in self.walls),
+                     default=math.inf)
+        zombies = self.zombies
+        candidates = self.zombie_grid.query_segment(x0, y0, x1, y1)
+        candidates = candidates[zombies.hp[candidates] > 0]
+        if len(candidates):
+            half_width = ZOMBIE_SIZE[0] / 2 + pad_x
+            half_height = ZOMBIE_SIZE[1] / 2 + pad_y
+            zx = zombies.x[candidates]
+            zy = zombies.y[candidates]
+            t = segment_entry(x0, y0, x1, y1, zx - half_width, zy - half_height, zx + half_width, zy + half_height)
+            nearest = int(np.argmin(t))
+            if t[nearest] < t_wall:
+                return float(t[nearest]), int(candidates[nearest]), False
+        return t_wall, None, math.isfinite(t_wall)
+
+    def resolve_shots(self):
+        for x0, y0, angle_rad, reach, damage in self.shots:
+            x1 = x0 + math.cos(angle_rad) * reach
+            y1 = y0 + math.sin(angle_rad) * reach
+            t, index, wall = self.cast(x0, y0, x1, y1)
+            t = min(t, 1.0)
+            hit_x = x0 + (x1 - x0) * t
+            hit_y = y0 + (y1 - y0) * t
+            if index is not None:
+                self.damage_zombie(index, damage)
+            elif wall:
+                self.create_muzzle_flash(hit_x, hit_y, math.degrees(angle_rad))
+            self.events.append(("shot", x0, y0, hit_x, hit_y))
+        self.shots = []
+
+    def update_bullet(self, bullet):
+        bullet.store_previous()
+        bullet.x += bullet.change_x * self.dt
+        bullet.y += bullet.change_y * self.dt
+
+        # Проверяется весь путь за тик, а не конечная точка: быстрая пуля не проскакивает сквозь зомби.
+        t, index, wall = self.cast(bullet.prev_x, bullet.prev_y, bullet.x, bullet.y,
+                                   bullet.width / 2, bullet.height / 2)
+        if index is not None:
+            self.damage_zombie(index)
+            return False
+        if wall:
+            hit_x = bullet.prev_x + (bullet.x - bullet.prev_x) * t
+            hit_y = bullet.prev_y + (bullet.y - bullet.prev_y) * t
+            self.create_muzzle_flash(hit_x, hit_y, bullet.angle)
+            return False
+
+        if bullet.x < 0 or bullet.x > self.width or bullet.y < 0 or bullet.y > self.height:
+            return False
+        return True
+
+    def damage_zombie(self, index, damage=1):
+        zombies = self.zombies
+        x, y = float(zombies.x[index]), float(zombies.y[index])
+        self.create_blood_effect(x, y, is_explosion=False)
+        zombies.hp[index] -= damage
+        if zombies.hp[index] <= 0:
+            self.create_blood_effect(x, y, is_explosion=True)
+            self.kills += 1
+            self.events.append(("zombie_killed", x, y))
+            self.drop_loot(x, y)
+
+    def drop_loot(self, x, y):
+        rng = self.rng
+        if rng.random() >= self.loot_chance:
+            return
+        kind = rng.choices(range(len(ITEM_KINDS)), weights=ITEM_WEIGHTS)[0]
+        self.items.add(kind, x, y, self.tick + int(round(ITEM_LIFETIME / self.dt)))
+
+    def accepts(self, kind, player=None):
+        inventory = (player or self.players[0]).inventory
+        if kind == "medkit":
+            return inventory.count("medkit") < MAX_MEDKITS
+        if kind == "ammo":
+            return any(WEAPONS[name]["max_ammo"] is not None and inventory.count(name) < WEAPONS[name]["max_ammo"]
+                       for name in inventory.weapons)
+        return not inventory.has_weapon(kind) or inventory.count(kind) < WEAPONS[kind]["max_ammo"]
+
+    def give(self, kind, player=None):
+        inventory = (player or self.players[0]).inventory
+        if kind == "medkit":
+            inventory.add("medkit", 1, MAX_MEDKITS)
+        elif kind == "ammo":
+            for name in inventory.weapons:
+                weapon = WEAPONS[name]
+                if weapon["max_ammo"] is not None:
+                    inventory.add(name, weapon["pickup"], weapon["max_ammo"])
+        else:
+            inventory.add_weapon(kind)
+            inventory.add(kind, WEAPONS[kind]["pickup"], WEAPONS[kind]["max_ammo"])
+
+    def use_medkit(self, player=None):
+        player = player or self.players[0]
+        if player.hp >= self.player_max_hp or not player.inventory.take("medkit"):
+            return False
+        player.hp = min(player.hp + MEDKIT_HEAL, self.player_max_hp)
+        self.events.append(("medkit", player.hp, self.players.index(player)))
+        return True
+
+    def update_items(self):
+        items = self.items
+        for item_id in items.expire(self.tick):
+            self.events.append(("item_expired", item_id))
+        # Прошлая позиция запоминается у всех предметов, а не только у ближних: предмет, который магнит тянул
+        # и упустил (игрок убежал быстрее), иначе остался бы со старой и дёргался бы при интерполяции.
+        items.store_previous()
+        for player in self.alive_players():
+            if not items.count:
+                return
+            self.collect_items(player)
+
+    def collect_items(self, player):
+        # Магнит и подбор смотрят только предметы из ближних ячеек сетки, а не все предметы на карте.
+        items = self.items
+        body = player.body
+        near = items.near(body.x, body.y, self.magnet_radius)
+        if not len(near):
+            return
+        taken = []
+        pulled = []
+        accepted = {}
+        for index, kind_index in zip(near.tolist(), items.kind[near].tolist()):
+            kind = ITEM_KINDS[kind_index]
+            if kind not in accepted:
+                accepted[kind] = self.accepts(kind, player)
+            if not accepted[kind]:
+                continue
+            if math.hypot(items.x[index] - body.x, items.y[index] - body.y) <= PICKUP_RADIUS:
+                taken.append((int(items.ids[index]), kind, float(items.x[index]), float(items.y[index])))
+                self.give(kind, player)
+                # После подбора инвентарь изменился: следующие предметы проверяются заново.
+                accepted.clear()
+            else:
+                pulled.append(index)
+        if pulled:
+            items.pull(np.array(pulled), body.x, body.y, MAGNET_SPEED * self.dt)
+        for item_id, kind, x, y in taken:
+            items.remove(item_id)
+            self.events.append(("pickup", kind, x, y))
+
+    def create_blood_effect(self, x, y, is_explosion=False):
+        rng = self.fx_rng
+        count = round((15 if is_explosion else 5) * self.effects_scale)
+        if count == 0:
+            return
+        speed_factor = BLOOD_EXPLOSION_SPEED if is_explosion else BLOOD_SPEED
+        angle = rng.random(count) * 2 * math.pi
+        speed = rng.random(count) * speed_factor
+        self.particles.emit(BLOOD, x, y, np.cos(angle) * speed, np.sin(angle) * speed,
+                            rng.integers(BLOOD_SIZE[0], BLOOD_SIZE[1] + 1, count),
+                            change_angle=rng.uniform(-BLOOD_SPIN, BLOOD_SPIN, count), fade_rate=BLOOD_FADE)
+
+    def create_muzzle_flash(self, x, y, angle_deg):
+        rng = self.fx_rng
+        count = round(3 * self.effects_scale)
+        if count == 0:
+            return
+        angle_rad = np.radians(angle_deg + rng.integers(-15, 16, count))
+        speed = rng.random(count) * SMOKE_SPEED
+        self.particles.emit(SMOKE, x, y, np.cos(angle_rad) * speed, np.sin(angle_rad) * speed,
+                            rng.integers(SMOKE_SIZE[0], SMOKE_SIZE[1] + 1, count),
+                            alpha=200, fade_rate=SMOKE_FADE)
+
+    def check_player_hits(self):
+        for index, player in enumerate(self.players):
+            if not player.alive or not len(self.zombies_touching(player.body)):
+                continue
+            if self.time - player.last_hit_time > self.hit_delay:
+                player.hp -= self.zombie_damage
+                player.last_hit_time = self.time
+                self.events.append(("player_hit", player.hp, index))
+                if player.hp <= 0:
+                    self.events.append(("player_down", index))
+        # Партия кончается, когда не осталось ни одного живого игрока.
+        if not self.alive_players():
+            self.game_over = True
+            self.events.append(("game_over",))
@@ -0,0 +1,207 @@
+import json
+import struct
+from collections import deque
+
+import numpy as np
+
+from horde import Horde
+from items import Inventory, ItemStore
+from particles import ParticleSystem
+from simulation import Player, Simulation
+
+SNAPSHOT_MAGIC = b"ZSAV"
+SNAPSHOT_VERSION = 4
+REWIND_INTERVAL = 30
+REWIND_SNAPSHOTS = 20
+
+# Заголовок: сигнатура, версия, длина JSON с редко меняющимися метаданными.
+_HEADER = struct.Struct("<4sHI")
+# Скаляры симуляции и размеры массивов, которые идут следом.
+_STATE = struct.Struct("<qdd?qqqqqqqqq")
+# Состояние каждого игрока: таймер выстрела, HP, время последнего удара, прицел и тело.
+_PLAYER = struct.Struct("<dddd7d")
+_BODY_FIELDS = ("x", "y", "prev_x", "prev_y", "change_x", "change_y", "angle")
+
+
+def save_state(sim):
+    rng_version, rng_words, gauss_next = sim.rng.getstate()
+    meta = {
+        "width": sim.width,
+        "height": sim.height,
+        "seed": sim.seed,
+        "dt": sim.dt,
+        "params": sim.params,
+        "view_size": sim.view_size,
+        "particle_capacity": sim.particles.capacity,
+        "horde_fields": Horde.FIELDS,
+        "players": [{"weapon": player.weapon, "inventory": player.inventory.to_dict()} for player in sim.players],
+        "rng": [rng_version, gauss_next],
+        "fx_rng": sim.fx_rng.bit_generator.state,
+        "ai_period_scale": sim.ai_period_scale,
+        "navigation": sim.navigator.state(),
+    }
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+
+    zombies = sim.zombies
+    particles = sim.particles
+    items = sim.items
+    n = zombies.count
+    p = particles.count
+    k = items.count
+    bullets = np.array([[getattr(bullet, name) for name in _BODY_FIELDS] for bullet in sim.bullets],
+                       dtype=np.float64).reshape(-1, len(_BODY_FIELDS))
+
+    parts = [
+        _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(meta_bytes)),
+        meta_bytes,
+        _STATE.pack(sim.tick, sim.time, sim.time_since_last_spawn, sim.game_over, sim.kills, len(sim.players),
+                    n, zombies.next_id, zombies.high_water, len(bullets), p, k, items.next_id),
+    ]
+    parts.extend(_PLAYER.pack(player.can_shoot_timer, player.hp, player.last_hit_time, player.aim_angle,
+                              *(getattr(player.body, name) for name in _BODY_FIELDS)) for player in sim.players)
+    parts.append(np.array(rng_words, dtype=np.uint32).tobytes())
+    parts.append(zombies.ids[:n].tobytes())
+    parts.extend(getattr(zombies, name)[:n].tobytes() for name in Horde.FIELDS)
+    parts.append(bullets.tobytes())
+    parts.append(particles.kind[:p].tobytes())
+    parts.extend(getattr(particles, name)[:p].tobytes() for name in ParticleSystem.FIELDS)
+    parts.extend(getattr(items, name)[:k].tobytes() for name in ("ids", "kind") + ItemStore.FIELDS)
+    parts.extend(array.tobytes() for array in sim.navigator.arrays())
+    return b"".join(parts)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def array(self, dtype, count):
+        array = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.offset)
+        self.offset += array.nbytes
+        return array
+
+
+def _read_meta(reader):
+    magic, version, meta_length = reader.unpack(_HEADER)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Это не сохранение Z ATTACK")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия сохранения: {version}")
+    meta = json.loads(bytes(reader.data[reader.offset:reader.offset + meta_length]))
+    reader.offset += meta_length
+    if tuple(meta["horde_fields"]) != Horde.FIELDS:
+        raise ValueError("Сохранение сделано с другим набором полей зомби")
+    return meta
+
+
+def load_state(data):
+    meta = _read_meta(_Reader(data))
+    sim = Simulation(meta["width"], meta["height"], seed=meta["seed"], dt=meta["dt"],
+                     max_particles=meta["particle_capacity"], params=meta["params"], view_size=meta["view_size"])
+    restore_state(sim, data)
+    return sim
+
+
+def restore_state(sim, data):
+    reader = _Reader(data)
+    meta = _read_meta(reader)
+    (sim.tick, sim.time, sim.time_since_last_spawn, sim.game_over, sim.kills, player_count, zombie_count, next_id,
+     high_water, bullet_count, particle_count, item_count, next_item_id) = reader.unpack(_STATE)
+
+    sim.players = []
+    for info in meta["players"][:player_count]:
+        player = Player(0, 0, sim.player_max_hp)
+        player.can_shoot_timer, hp, player.last_hit_time, player.aim_angle, *body = reader.unpack(_PLAYER)
+        # HP хранится как double; целое возвращается целым, чтобы HUD и события видели то же, что до сохранения.
+        player.hp = int(hp) if hp.is_integer() else hp
+        for name, value in zip(_BODY_FIELDS, body):
+            setattr(player.body, name, value)
+        player.weapon = info["weapon"]
+        player.inventory = Inventory.from_dict(info["inventory"])
+        sim.players.append(player)
+
+    rng_version, gauss_next = meta["rng"]
+    sim.rng.setstate((rng_version, tuple(reader.array(np.uint32, 625).tolist()), gauss_next))
+    sim.fx_rng.bit_generator.state = meta["fx_rng"]
+    sim.set_ai_period_scale(meta.get("ai_period_scale", 1))
+
+    zombies = sim.zombies
+    while zombies.capacity < zombie_count:
+        zombies._grow()
+    zombies.count = zombie_count
+    zombies.next_id = next_id
+    zombies.high_water = high_water
+    zombies.version += 1
+    zombies.ids[:zombie_count] = reader.array(np.int64, zombie_count)
+    for name in Horde.FIELDS:
+        getattr(zombies, name)[:zombie_count] = reader.array(np.float64, zombie_count)
+
+    for bullet in sim.bullets:
+        sim.bullet_pool.release(bullet)
+    sim.bullets = []
+    for row in reader.array(np.float64, bullet_count * len(_BODY_FIELDS)).reshape(-1, len(_BODY_FIELDS)).tolist():
+        bullet = sim.bullet_pool.acquire()
+        for name, value in zip(_BODY_FIELDS, row):
+            setattr(bullet, name, value)
+        sim.bullets.append(bullet)
+
+    particles = sim.particles
+    kept = min(particle_count, particles.capacity)
+    particles.kind[:kept] = reader.array(np.int8, particle_count)[:kept]
+    for name in ParticleSystem.FIELDS:
+        getattr(particles, name)[:kept] = reader.array(np.float32, particle_count)[:kept]
+    particles.count = kept
+
+    items = sim.items
+    while items.capacity < item_count:
+        items._grow()
+    items.ids[:item_count] = reader.array(np.int64, item_count)
+    items.kind[:item_count] = reader.array(np.int64, item_count)
+    for name in ItemStore.FIELDS:
+        getattr(items, name)[:item_count] = reader.array(np.float64, item_count)
+    items.restore(item_count, next_item_id)
+
+    # Сетка производная и пересоберётся на следующем тике; поля навигации читаются готовыми.
+    sim.navigator.restore(meta["navigation"], reader.array)
+    sim.events = []
+    return sim
+
+
+def save_snapshot(path, sim):
+    with open(path, "wb") as f:
+        f.write(save_state(sim))
+
+
+def load_snapshot(path):
+    with open(path, "rb") as f:
+        return load_state(f.read())
+
+
+class SnapshotRing:
+    def __init__(self, capacity=REWIND_SNAPSHOTS, interval=REWIND_INTERVAL):
+        self.interval = interval
+        self.snapshots = deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def record(self, sim):
+        if sim.tick % self.interval == 0:
+            self.snapshots.append(save_state(sim))
+
+    def rewind(self, sim):
+        # Снимок текущего тика пропускается: иначе перемотка сразу после записи ничего бы не меняла.
+        while self.snapshots:
+            data = self.snapshots.pop()
+            if _STATE.unpack_from(data, _HEADER.size + _HEADER.unpack_from(data)[2])[0] < sim.tick:
+                restore_state(sim, data)
+                return True
+        return False
+
+    def clear(self):
+        self.snapshots.clear()
@@ -0,0 +1,123 @@
+import numpy as np
+
+_OFFSET = 1 << 20
+_STRIDE = 1 << 21
+
+
+def segment_entry(x0, y0, x1, y1, left, bottom, right, top):
+    # Доля пути t в [0, 1], на которой отрезок входит в прямоугольник, или inf, если не пересекает.
+    # Аргументы могут быть массивами: много отрезков против одного прямоугольника или наоборот.
+    hit_range = []
+    for start, end, low, high in ((x0, x1, left, right), (y0, y1, bottom, top)):
+        delta = np.subtract(end, start)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t1 = (low - start) / delta
+            t2 = (high - start) / delta
+        inside = (start >= low) & (start <= high)
+        flat = delta == 0
+        t_enter = np.where(flat, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2))
+        t_exit = np.where(flat, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2))
+        hit_range.append((t_enter, t_exit))
+    t_enter = np.maximum(np.maximum(hit_range[0][0], hit_range[1][0]), 0.0)
+    t_exit = np.minimum(np.minimum(hit_range[0][1], hit_range[1][1]), 1.0)
+    return np.where(t_enter <= t_exit, t_enter, np.inf)
+
+
+class SpatialGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.order = np.zeros(0, dtype=np.int64)
+        self.sorted_keys = np.zeros(0, dtype=np.int64)
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def keys(self, x, y):
+        cx = np.floor_divide(x, self.cell_size).astype(np.int64)
+        cy = np.floor_divide(y, self.cell_size).astype(np.int64)
+        return (cx + _OFFSET) * _STRIDE + (cy + _OFFSET)
+
+    def rebuild(self, x, y):
+        # Сортировка по ключу ячейки: элементы одной ячейки лежат подряд в self.order.
+        keys = self.keys(x, y)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def query(self, left, bottom, right, top):
+        if not len(self.order):
+            return self.order
+        x0, y0 = self.cell_of(left, bottom)
+        x1, y1 = self.cell_of(right, top)
+        cells = [(cx + _OFFSET) * _STRIDE + (cy + _OFFSET)
+                 for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+        starts = np.searchsorted(self.sorted_keys, cells, side="left")
+        ends = np.searchsorted(self.sorted_keys, cells, side="right")
+        found = [self.order[start:end] for start, end in zip(starts.tolist(), ends.tolist()) if end > start]
+        if not found:
+            return self.order[:0]
+        if len(found) == 1:
+            return found[0]
+        return np.concatenate(found)
+
+    def pairs(self, x, y, reach=1, max_per_cell=8):
+        # Пары соседей (i, j) из окрестных ячеек, каждая пара ровно один раз: в своей ячейке берутся
+        # следующие по порядку точки, из соседних — только ячейки «впереди». С одной ячейки не больше
+        # max_per_cell соседей, поэтому работа растёт линейно даже в плотной толпе.
+        n = len(x)
+        if n < 2 or len(self.order) != n:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        cx = np.floor_divide(x, self.cell_size).astype(np.int64) + _OFFSET
+        cy = np.floor_divide(y, self.cell_size).astype(np.int64) + _OFFSET
+        forward = [(ox, oy) for ox in range(0, reach + 1) for oy in range(-reach, reach + 1) if ox > 0 or oy > 0]
+        keys = np.stack([cx * _STRIDE + cy] + [(cx + ox) * _STRIDE + (cy + oy) for ox, oy in forward], axis=1)
+
+        starts = np.searchsorted(self.sorted_keys, keys, side="left")
+        ends = np.searchsorted(self.sorted_keys, keys, side="right")
+        rank = np.empty(n, dtype=np.int64)
+        rank[self.order] = np.arange(n)
+        starts[:, 0] = rank + 1
+
+        slots = starts[:, :, None] + np.arange(max_per_cell)
+        owner, cell, slot = np.nonzero(slots < ends[:, :, None])
+        return owner, self.order[slots[owner, cell, slot]]
+
+    def cells_on_segment(self, x0, y0, x1, y1):
+        # Обход ячеек вдоль отрезка (DDA): каждая пересечённая ячейка ровно один раз, без пропусков на диагоналях.
+        size = self.cell_size
+        cx, cy = int(x0 // size), int(y0 // size)
+        end_x, end_y = int(x1 // size), int(y1 // size)
+        dx = x1 - x0
+        dy = y1 - y0
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        t_max_x = ((cx + (step_x > 0)) * size - x0) / dx if dx else float("inf")
+        t_max_y = ((cy + (step_y > 0)) * size - y0) / dy if dy else float("inf")
+        t_delta_x = size / abs(dx) if dx else float("inf")
+        t_delta_y = size / abs(dy) if dy else float("inf")
+
+        cells = [(cx, cy)]
+        for _ in range(abs(end_x - cx) + abs(end_y - cy)):
+            if t_max_x < t_max_y:
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                cy += step_y
+                t_max_y += t_delta_y
+            cells.append((cx, cy))
+        return cells
+
+    def query_segment(self, x0, y0, x1, y1):
+        # Кандидаты вдоль отрезка. Объект шире точки может задевать отрезок центром из соседней ячейки,
+        # поэтому берутся и соседи пройденных ячеек (размер ячейки не меньше размера объекта).
+        if not len(self.order):
+            return self.order
+        cells = {(cx + _OFFSET + ox) * _STRIDE + (cy + _OFFSET + oy)
+                 for cx, cy in self.cells_on_segment(x0, y0, x1, y1) for ox in (-1, 0, 1) for oy in (-1, 0, 1)}
+        cells = np.fromiter(cells, dtype=np.int64, count=len(cells))
+        starts = np.searchsorted(self.sorted_keys, cells, side="left")
+        ends = np.searchsorted(self.sorted_keys, cells, side="right")
+        found = [self.order[start:end] for start, end in zip(starts.tolist(), ends.tolist()) if end > start]
+        if not found:
+            return self.order[:0]
+        return np.concatenate(found)
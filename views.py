@@ -0,0 +1,56 @@
+import importlib
+import weakref
+
+# Где искать класс экрана, если его не зарегистрировали явно. main.py и game.py при запуске скриптом
+# регистрируют свои экраны сами: их классы живут в __main__, и импорт модуля создал бы вторые копии.
+VIEW_CLASSES = {
+    "menu": ("main", "MenuView"),
+    "game": ("game", "GameView"),
+    "pause": ("game", "PauseView"),
+    "game_over": ("game", "GameOverView"),
+    "net_game": ("game", "NetGameView"),
+}
+
+
+class ViewRegistry:
+    # Каждый экран создаётся один раз на окно; при повторном показе он только сбрасывается в setup,
+    # а его UIManager, спрайты и GPU-ресурсы переиспользуются.
+    def __init__(self):
+        self.classes = {}
+        self.views = {}
+        self.created = 0
+
+    def register(self, name, view_class):
+        self.classes[name] = view_class
+
+    def get(self, name):
+        view = self.views.get(name)
+        if view is None:
+            view_class = self.classes.get(name)
+            if view_class is None:
+                module, attr = VIEW_CLASSES[name]
+                view_class = getattr(importlib.import_module(module), attr)
+            view = self.views[name] = view_class()
+            self.created += 1
+        return view
+
+
+_registries = weakref.WeakKeyDictionary()
+
+
+def registry(window):
+    views = _registries.get(window)
+    if views is None:
+        views = _registries[window] = ViewRegistry()
+    return views
+
+
+def get(window, name):
+    return registry(window).get(name)
+
+
+def show(window, name, *args, **kwargs):
+    view = get(window, name)
+    view.setup(*args, **kwargs)
+    window.show_view(view)
+    return view
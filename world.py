@@ -0,0 +1,88 @@
+import math
+
+import arcade
+from PIL import Image
+
+from assets import get_texture
+
+CHUNK_SIZE = 256
+TILE_SCALE = 4
+CHUNK_MARGIN = 1
+
+
+class ChunkMap:
+    def __init__(self, width, height, seed=0, chunk_size=CHUNK_SIZE, scale=TILE_SCALE, margin=CHUNK_MARGIN):
+        self.chunk_size = chunk_size
+        self.scale = scale
+        self.margin = margin
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.cols = int(math.ceil(width / chunk_size))
+        self.rows = int(math.ceil(height / chunk_size))
+        self.sprite_list = arcade.SpriteList()
+        self.loaded = {}
+        self.loads = 0
+        self.unloads = 0
+
+        texture = get_texture("background_forest")
+        self.variants = []
+        if texture is not None:
+            tile = texture.image
+            self.variants = [tile, tile.transpose(Image.FLIP_LEFT_RIGHT), tile.transpose(Image.FLIP_TOP_BOTTOM),
+                             tile.transpose(Image.ROTATE_180)]
+
+    def _build(self, col, row):
+        # Тайлы выровнены по общей для всего мира сетке, а отражение тайла зависит только от его координат:
+        # швов между чанками нет, и выгруженный чанк при повторной загрузке выглядит так же.
+        pixels = int(math.ceil(self.chunk_size / self.scale))
+        image = Image.new("RGBA", (pixels, pixels))
+        tile_width, tile_height = self.variants[0].size
+        origin_x = col * pixels
+        # Строки картинки идут сверху вниз, поэтому по вертикали отсчёт от верхнего края чанка.
+        origin_y = -(row + 1) * pixels
+        for y in range(-(origin_y % tile_height), pixels, tile_height):
+            tile_y = (origin_y + y) // tile_height
+            for x in range(-(origin_x % tile_width), pixels, tile_width):
+                tile_x = (origin_x + x) // tile_width
+                variant = ((tile_x * 73856093) ^ (tile_y * 19349663) ^ self.seed) % len(self.variants)
+                image.paste(self.variants[variant], (x, y))
+
+        texture = arcade.Texture(image, hash=f"chunk-{self.seed}-{col}-{row}",
+                                 hit_box_algorithm=arcade.hitbox.algo_bounding_box)
+        sprite = arcade.Sprite(texture, scale=self.scale)
+        sprite.left = col * self.chunk_size
+        sprite.bottom = row * self.chunk_size
+        return sprite
+
+    def reset(self, seed):
+        # Новая партия на той же карте: чанки с другим сидом выгружаются, с тем же — остаются как есть.
+        if seed == self.seed:
+            return
+        self.seed = seed
+        for key in list(self.loaded):
+            self.sprite_list.remove(self.loaded.pop(key))
+            self.unloads += 1
+
+    def update(self, left, bottom, right, top):
+        if not self.variants:
+            return
+        size = self.chunk_size
+        col0 = max(int(left // size) - self.margin, 0)
+        row0 = max(int(bottom // size) - self.margin, 0)
+        col1 = min(int(right // size) + self.margin, self.cols - 1)
+        row1 = min(int(top // size) + self.margin, self.rows - 1)
+        wanted = {(col, row) for col in range(col0, col1 + 1) for row in range(row0, row1 + 1)}
+
+        # Текстура ушедшего чанка освобождается в атласе сборщиком мусора, когда на неё не остаётся ссылок.
+        for key in [key for key in self.loaded if key not in wanted]:
+            self.sprite_list.remove(self.loaded.pop(key))
+            self.unloads += 1
+        for key in sorted(wanted - self.loaded.keys()):
+            sprite = self._build(*key)
+            self.loaded[key] = sprite
+            self.sprite_list.append(sprite)
+            self.loads += 1
+
+    def draw(self):
+        self.sprite_list.draw(pixelated=True)